@@ -146,21 +146,32 @@ class OctantsProperty(ElementProperty):
         new = OctantsProperty(element.tag, [])
         if not element.text:
             return new
-        allinds = []
-        ind_s = element.text.strip().replace(" ", "").replace("\n", ",").split(",")
-        ind = []
-        for idx, i in enumerate(ind_s):
-            if idx % 3 == 0 and idx != 0:
-                allinds.append(ind)
-                ind = []
-            if i:
-                ind.append(int(i))
-
-        new.value = allinds
+
+        # One line of vertex indices per octant, between the line breaks after the tag and before the closing tag.
+        # Empty lines are empty octants.
+        lines = element.text.split('\n')
+        if not lines[0].strip():
+            lines = lines[1:]
+        if lines and not lines[-1].strip():
+            lines = lines[:-1]
+        for line in lines:
+            new.value.append([int(i)
+                             for i in line.replace(',', ' ').split()])
+
         return new
 
     def to_xml(self):
         element = ET.Element(self.tag_name)
+        if not self.value:
+            return element
+
+        text = ['\n']
+        for octant in self.value:
+            text.append(', '.join(str(index) for index in octant))
+            text.append('\n')
+
+        element.text = ''.join(text)
+
         return element
 
 
@@ -1,36 +1,193 @@
 """Manages reading/writing Codewalker XML files"""
+import copyreg
 from mathutils import Vector, Quaternion, Matrix
-from abc import abstractmethod, ABC as AbstractClass, abstractclassmethod
+from abc import abstractmethod, ABC as AbstractClass, ABCMeta, abstractclassmethod
 from dataclasses import dataclass
 from typing import Any, Text
 from xml.etree import ElementTree as ET
 from numpy import float32
 
-"""Custom indentation to get elements like <VerticesProperty /> to output nicely"""
-
-
-def indent(elem: ET.Element, level=0):
-    amount = "  "
-    i = "\n" + level*amount
-    if len(elem):
-        if not elem.text or not elem.text.strip():
-            elem.text = i + amount
-        if not elem.tail or not elem.tail.strip():
-            elem.tail = i
-        for elem in elem:
-            indent(elem, level+1)
-        if not elem.tail or not elem.tail.strip():
-            elem.tail = i
+try:
+    from lxml import etree as lxml_etree
+except ImportError:
+    lxml_etree = None
+
+"""Backend used to parse XML files. lxml is used when it is installed, otherwise the standard library parser.
+Elements built by to_xml and written by write_xml are always standard library elements."""
+XML_BACKEND = "lxml" if lxml_etree is not None else "stdlib"
+
+
+def set_xml_backend(name: str):
+    global XML_BACKEND
+    if name not in ("lxml", "stdlib"):
+        raise ValueError(f"Unknown XML backend '{name}'!")
+    if name == "lxml" and lxml_etree is None:
+        raise ValueError("The lxml XML backend is not installed!")
+    XML_BACKEND = name
+
+
+def parse_xml(filepath):
+    """Parse the XML file at filepath and return its root element"""
+    if XML_BACKEND == "lxml":
+        # Comments and processing instructions are dropped to match the standard library parser
+        parser = lxml_etree.XMLParser(
+            remove_comments=True, remove_pis=True, huge_tree=True)
+        return lxml_etree.parse(filepath, parser).getroot()
+
+    return ET.parse(filepath).getroot()
+
+
+def iterparse_xml(filepath, events):
+    """Iterate over the (event, element) pairs of the XML file at filepath"""
+    if XML_BACKEND == "lxml":
+        return lxml_etree.iterparse(filepath, events=events, remove_comments=True, remove_pis=True, huge_tree=True)
+
+    return ET.iterparse(filepath, events=events)
+
+"""Pickle mathutils values by their components, so parsed object models can be sent between processes"""
+copyreg.pickle(Vector, lambda vector: (Vector, (tuple(vector),)))
+copyreg.pickle(Quaternion, lambda quaternion: (
+    Quaternion, (tuple(quaternion),)))
+copyreg.pickle(Matrix, lambda matrix: (
+    Matrix, (tuple(tuple(row) for row in matrix),)))
+
+
+"""Indentation of one level in written XML files"""
+XML_INDENT = "  "
+
+
+def escape_xml_text(text: str):
+    if "&" in text:
+        text = text.replace("&", "&amp;")
+    if "<" in text:
+        text = text.replace("<", "&lt;")
+    if ">" in text:
+        text = text.replace(">", "&gt;")
+    return text
+
+
+def escape_xml_attribute(value: str):
+    value = escape_xml_text(value)
+    if "\"" in value:
+        value = value.replace("\"", "&quot;")
+    if "\r" in value:
+        value = value.replace("\r", "&#13;")
+    if "\n" in value:
+        value = value.replace("\n", "&#10;")
+    if "\t" in value:
+        value = value.replace("\t", "&#09;")
+    return value
+
+
+def format_xml_attributes(attributes: dict):
+    return "".join([f' {name}="{escape_xml_attribute(value)}"' for name, value in attributes.items()])
+
+
+def write_xml_element(write, element: ET.Element, level=0):
+    """Write element and its children indented. Innertext spanning multiple lines, like the data of
+    <VerticesProperty />, is indented one level deeper than its element."""
+    tag = element.tag
+    start = "<" + tag + format_xml_attributes(element.attrib)
+    text = element.text
+    num_children = len(element)
+
+    if num_children:
+        if not text or not text.strip():
+            text = "\n" + XML_INDENT * (level + 1)
+        write(start + ">" + escape_xml_text(text))
+
+        for index, child in enumerate(element):
+            write_xml_element(write, child, level + 1)
+            tail = child.tail
+            if not tail or not tail.strip():
+                tail = "\n" + XML_INDENT * \
+                    (level if index == num_children - 1 else level + 1)
+            write(escape_xml_text(tail))
+
+        write("</" + tag + ">")
+        return
+
+    if text and "\n" in text:
+        lines = text.strip()
+        if lines:
+            line_indent = "\n" + XML_INDENT * (level + 1)
+            text = line_indent + \
+                lines.replace("\n", line_indent) + "\n" + XML_INDENT * level
+
+    if text:
+        write(start + ">" + escape_xml_text(text) + "</" + tag + ">")
     else:
-        if level and (not elem.tail or not elem.tail.strip()):
-            elem.tail = i
+        write(start + " />")
 
-        # Indent innertext of elements on new lines. Used in cases like <VerticesProperty />
-        if elem.text and len(elem.text.strip()) > 0 and elem.text.find('\n') != -1:
-            lines = elem.text.strip().split('\n')
-            for index, line in enumerate(lines):
-                lines[index] = ((level + 1) * amount) + line
-            elem.text = '\n' + '\n'.join(lines) + i
+
+"""Classes mapped to whether they can be written from get_xml_parts"""
+_streams_xml = {}
+
+
+def streams_xml(cls):
+    """Whether objects of cls can be written from get_xml_parts, meaning to_xml is not overridden below the
+    class that implements it"""
+    result = _streams_xml.get(cls)
+    if result is None:
+        parts_class = get_defining_class(cls, "get_xml_parts")
+        mro = cls.__mro__
+        result = parts_class is not Element and mro.index(
+            parts_class) <= mro.index(get_defining_class(cls, "to_xml"))
+        _streams_xml[cls] = result
+    return result
+
+
+def get_xml_node(obj):
+    """Get what the streaming writer writes for obj: its XML parts if it supports streaming, otherwise the
+    ET.Element built by to_xml. None if obj has nothing to write."""
+    if streams_xml(type(obj)):
+        return obj.get_xml_parts()
+    return obj.to_xml()
+
+
+def build_xml_element(parts):
+    """Build the ET.Element for the XML parts returned by get_xml_parts"""
+    if parts is None:
+        return None
+
+    tag_name, attributes, children = parts
+    element = ET.Element(tag_name, attrib=attributes)
+    for child in children:
+        child_element = child.to_xml()
+        if child_element is not None:
+            element.append(child_element)
+    return element
+
+
+def write_xml_node(write, node, level=0):
+    """Write a node returned by get_xml_node. Children of objects that support streaming are converted
+    and written one at a time, so the full ET.Element tree is never built. Returns whether the node had
+    children."""
+    if not isinstance(node, tuple):
+        write_xml_element(write, node, level)
+        return len(node) > 0
+
+    tag_name, attributes, children = node
+    start = "<" + tag_name + format_xml_attributes(attributes)
+    child_indent = "\n" + XML_INDENT * (level + 1)
+    has_children = False
+
+    for child in children:
+        child_node = get_xml_node(child)
+        if child_node is None:
+            continue
+        if not has_children:
+            write(start + ">")
+            has_children = True
+        write(child_indent)
+        write_xml_node(write, child_node, level + 1)
+
+    if has_children:
+        write("\n" + XML_INDENT * level + "</" + tag_name + ">")
+    else:
+        write(start + " />")
+
+    return has_children
 
 
 """Determine if a string is a bool, int, or float"""
@@ -53,6 +210,54 @@ def get_str_type(value: str):
     return value
 
 
+"""Objects already built for elements of a document that is being read with read_xml_stream"""
+_streamed = {}
+
+
+def from_xml_child(element_type, element: ET.Element):
+    """Convert a child element, reusing the object built for it while streaming"""
+    obj = _streamed.pop(element, None)
+    if obj is None:
+        obj = element_type.from_xml(element)
+    return obj
+
+
+def read_xml_stream(cls, filepath):
+    """Read XML from filepath with iterparse, converting each known subtree as soon as its end tag
+    arrives and clearing it afterwards, so the whole document is never held in memory next to the
+    object model."""
+    root = None
+    types = []
+    try:
+        for event, element in iterparse_xml(filepath, ("start", "end")):
+            if event == "start":
+                if not types:
+                    types.append(cls)
+                else:
+                    parent_type = types[-1]
+                    types.append(parent_type.stream_child_type(
+                        element.tag) if parent_type else None)
+                continue
+
+            element_type = types.pop()
+            if not types:
+                root = cls.from_xml(element)
+            elif element_type is not None:
+                _streamed[element] = element_type.from_xml(element)
+                element.clear()
+    finally:
+        _streamed.clear()
+
+    return root
+
+
+def get_defining_class(cls, name):
+    """Get the class in the MRO of cls that defines name"""
+    for klass in cls.__mro__:
+        if name in vars(klass):
+            return klass
+
+
 class Element(AbstractClass):
     """Abstract XML element to base all other XML elements off of"""
     @property
@@ -75,83 +280,188 @@ class Element(AbstractClass):
     def to_xml(self):
         raise NotImplementedError
 
-    """Read XML from filepath"""
+    """Get the tag name, attributes and child objects of the element, or None if there is nothing to write.
+    Elements implementing this are written by write_xml one child at a time instead of through to_xml"""
+
+    def get_xml_parts(self):
+        raise NotImplementedError
+
+    """Get the type a child element with the given tag is converted to while streaming, or None to convert it along with its parent"""
     @classmethod
-    def from_xml_file(cls, filepath):
-        elementTree = ET.ElementTree()
-        elementTree.parse(filepath)
-        return cls.from_xml(elementTree.getroot())
+    def stream_child_type(cls, tag):
+        return None
+
+    """Read XML from filepath. When stream is set, subtrees are converted while the file is being parsed"""
+    @classmethod
+    def from_xml_file(cls, filepath, stream=True):
+        if stream:
+            return read_xml_stream(cls, filepath)
+
+        return cls.from_xml(parse_xml(filepath))
 
     """Write object as XML to filepath"""
 
     def write_xml(self, filepath):
-        element = self.to_xml()
-        indent(element)
-        elementTree = ET.ElementTree(element)
-        elementTree.write(filepath, encoding="UTF-8", xml_declaration=True)
+        with open(filepath, "w", encoding="UTF-8", errors="xmlcharrefreplace") as file:
+            file.write("<?xml version='1.0' encoding='UTF-8'?>\n")
+            if write_xml_node(file.write, get_xml_node(self)):
+                file.write("\n")
+
+
+class PropertyValue:
+    """Descriptor that reads and writes the value of the ElementProperty or AttributeProperty an
+    ElementTree stores under the same name"""
+    __slots__ = ("name", "default")
+
+    def __init__(self, name, default=None):
+        self.name = name
+        # Class attribute shadowed by the descriptor, returned when there is no property to read
+        self.default = default
 
+    def __get__(self, obj, objtype=None):
+        try:
+            return obj.__dict__[self.name].value
+        except (AttributeError, KeyError):
+            if obj is None:
+                return self.default
+            return obj.__dict__.get(self.name, self.default)
+
+    def __set__(self, obj, value):
+        props = obj.__dict__
+        prop = props.get(self.name)
+        if isinstance(prop, (ElementProperty, AttributeProperty)) and not isinstance(value, (ElementProperty, AttributeProperty)):
+            # If the object is an ElementProperty or AttributeProperty, set it's value
+            prop.value = value
+        else:
+            props[self.name] = value
+
+
+def set_property_value(obj, name, value):
+    """Attribute assignment of ElementTree classes that are not compiled yet. Like the PropertyValue
+    descriptors, assigning a plain value to a property sets the value of the property."""
+    prop = obj.__dict__.get(name)
+    if isinstance(prop, (ElementProperty, AttributeProperty)) and not isinstance(value, (ElementProperty, AttributeProperty)):
+        prop.value = value
+    else:
+        object.__setattr__(obj, name, value)
 
-class ElementTree(Element):
+
+class ElementTreeMeta(ABCMeta):
+    """Compiles the properties of an ElementTree class after its first instance is created"""
+
+    def __call__(cls, *args, **kwargs):
+        new = super().__call__(*args, **kwargs)
+        if "_property_names" not in cls.__dict__:
+            cls.compile_properties(new)
+        return new
+
+
+class ElementTree(Element, metaclass=ElementTreeMeta):
     """XML element that contains children defined by it's properties"""
 
+    # There are no descriptors before the first instance is created, so until then assignments set the
+    # values of properties themselves. Compiled classes assign through the descriptors at native speed.
+    __setattr__ = set_property_value
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # A subclass of a compiled class is not compiled itself
+        cls.__setattr__ = set_property_value
+
+    @classmethod
+    def compile_properties(cls, new):
+        """Compile the schema of the class from new, an instance of the class. Adds a PropertyValue descriptor
+        for every property and builds the tag and attribute maps used by from_xml."""
+        names = []
+        child_properties = {}
+        attribute_properties = []
+        for name, obj in vars(new).items():
+            if isinstance(obj, (ElementProperty, AttributeProperty)):
+                setattr(cls, name, PropertyValue(
+                    name, getattr(cls, name, None)))
+                names.append(name)
+
+            if isinstance(obj, Element):
+                child_properties.setdefault(
+                    obj.tag_name, []).append((name, type(obj)))
+            elif isinstance(obj, AttributeProperty):
+                attribute_properties.append((name, obj.name))
+
+        cls._property_names = tuple(names)
+        cls._child_properties = {tag: tuple(props)
+                                 for tag, props in child_properties.items()}
+        cls._attribute_properties = tuple(attribute_properties)
+        cls.__setattr__ = object.__setattr__
+
+    @classmethod
+    def get_child_properties(cls):
+        """Get a map of child tag -> (property name, property type) for each property read from that tag"""
+        if "_property_names" not in cls.__dict__:
+            cls()
+        return cls._child_properties
+
+    @classmethod
+    def stream_child_type(cls, tag):
+        props = cls.get_child_properties().get(tag)
+        if props:
+            return props[0][1]
+
     """Convert ET.Element object to ElementTree"""
     @classmethod
     def from_xml(cls: Element, element: ET.Element):
         new = cls()
-
-        for prop_name, obj_element in vars(new).items():
-            if isinstance(obj_element, Element):
-                child = element.find(obj_element.tag_name)
-                if child != None and obj_element.tag_name == child.tag:
-                    # Add element to object if tag is defined in class definition
-                    setattr(new, prop_name, type(obj_element).from_xml(child))
-            elif isinstance(obj_element, AttributeProperty):
-                # Add attribute to element if attribute is defined in class definition
-                if obj_element.name in element.attrib and new.tag_name == element.tag:
-                    obj_element.value = element.get(obj_element.name)
+        props = new.__dict__
+        child_properties = cls._child_properties
+
+        # Only the first child with a given tag is read
+        read_tags = set()
+        for child in element:
+            tag = child.tag
+            if tag not in child_properties or tag in read_tags:
+                continue
+            read_tags.add(tag)
+
+            # Add element to object if tag is defined in class definition
+            for prop_name, prop_type in child_properties[tag]:
+                props[prop_name] = from_xml_child(prop_type, child)
+
+        # Add attribute to element if attribute is defined in class definition
+        if element.attrib and new.tag_name == element.tag:
+            for prop_name, attribute_name in cls._attribute_properties:
+                if attribute_name in element.attrib:
+                    props[prop_name].value = element.get(attribute_name)
 
         return new
 
-    """Convert ElementTree to ET.Element object"""
-
-    def to_xml(self):
-        root = ET.Element(self.tag_name)
+    def get_xml_parts(self):
+        attributes = {}
+        children = []
         for child in vars(self).values():
             if isinstance(child, Element):
-                element = child.to_xml()
-                if(element != None):
-                    root.append(element)
+                children.append(child)
             elif isinstance(child, AttributeProperty):
-                root.set(child.name, str(child.value))
+                attributes[child.name] = str(child.value)
 
-        return root
+        return self.tag_name, attributes, children
 
-    def __getattribute__(self, key: str, onlyValue: bool = True):
-        obj = None
-        # Try and see if key exists
-        try:
-            obj = object.__getattribute__(self, key)
-            if isinstance(obj, (ElementProperty, AttributeProperty)) and onlyValue:
-                # If the property is an ElementProperty or AttributeProperty, and onlyValue is true, return just the value of the Element property
-                return obj.value
-            else:
-                return obj
-        except AttributeError:
-            # Key doesn't exist, return None
-            return None
+    """Convert ElementTree to ET.Element object"""
 
-    def __setattr__(self, name: str, value) -> None:
-        # Get the full object
-        obj = self.__getattribute__(name, False)
-        if obj and isinstance(obj, (ElementProperty, AttributeProperty)) and not isinstance(value, (ElementProperty, AttributeProperty)):
-            # If the object is an ElementProperty or AttributeProperty, set it's value
-            obj.value = value
-            super().__setattr__(name, obj)
-        else:
-            super().__setattr__(name, value)
+    def to_xml(self):
+        return build_xml_element(self.get_xml_parts())
+
+    def __setstate__(self, state):
+        # Unpickled objects are not created through ElementTreeMeta, so the class may not be compiled yet
+        type(self).get_child_properties()
+        self.__dict__.update(state)
+
+    def __getattr__(self, name: str):
+        # Missing properties read as None
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return None
 
     def get_element(self, key):
-        obj = self.__getattribute__(key, False)
+        obj = self.__dict__.get(key)
 
         if isinstance(obj, ElementProperty):
             return obj
@@ -206,6 +516,12 @@ class ListProperty(ElementProperty, AbstractClass):
     def __init__(self, tag_name=None, value=None):
         super().__init__(tag_name or type(self).tag_name, value or [])
 
+    @classmethod
+    def stream_child_type(cls, tag):
+        # Lists with their own from_xml read their children themselves
+        if get_defining_class(cls, "from_xml") is ListProperty and tag == cls.list_type.tag_name:
+            return cls.list_type
+
     @classmethod
     def from_xml(cls, element: ET.Element):
         new = cls(element.tag)
@@ -213,27 +529,27 @@ class ListProperty(ElementProperty, AbstractClass):
         children = element.findall(new.list_type.tag_name)
 
         for child in children:
-            new.value.append(new.list_type.from_xml(child))
+            new.value.append(from_xml_child(new.list_type, child))
         return new
 
-    def to_xml(self):
-        element = ET.Element(self.tag_name)
+    def get_xml_parts(self):
+        if not self.value:
+            return None
 
+        for item in self.value:
+            if not isinstance(item, self.list_type):
+                raise TypeError(
+                    f"{type(self).__name__} can only hold objects of type '{self.list_type.__name__}', not '{type(item)}'")
+
+        attributes = {}
         for child in vars(self).values():
             if isinstance(child, AttributeProperty):
-                element.set(child.name, str(child.value))
-
-        if self.value and len(self.value) > 0:
-            for item in self.value:
-                if isinstance(item, self.list_type):
-                    element.append(item.to_xml())
-                else:
-                    raise TypeError(
-                        f"{type(self).__name__} can only hold objects of type '{self.list_type.__name__}', not '{type(item)}'")
+                attributes[child.name] = str(child.value)
 
-            return element
+        return self.tag_name, attributes, self.value
 
-        return None
+    def to_xml(self):
+        return build_xml_element(self.get_xml_parts())
 
 
 class TextProperty(ElementProperty):
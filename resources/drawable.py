@@ -6,6 +6,8 @@ from .bound import *
 from collections import namedtuple
 from collections.abc import MutableSequence
 from enum import Enum
+from functools import lru_cache
+import numpy as np
 
 
 class YDD:
@@ -300,6 +302,40 @@ class VertexSemantic(str, Enum):
     tangent = "T"
 
 
+# Component type and count of each vertex layout semantic
+VERTEX_COMPONENTS = {
+    "Position": ("f4", 3),
+    "BlendWeights": ("u1", 4),
+    "BlendIndices": ("u1", 4),
+    "Normal": ("f4", 3),
+    "Colour0": ("u1", 4),
+    "Colour1": ("u1", 4),
+    "TexCoord0": ("f4", 2),
+    "TexCoord1": ("f4", 2),
+    "TexCoord2": ("f4", 2),
+    "TexCoord3": ("f4", 2),
+    "TexCoord4": ("f4", 2),
+    "TexCoord5": ("f4", 2),
+    "TexCoord6": ("f4", 2),
+    "TexCoord7": ("f4", 2),
+    "Tangent": ("f4", 4),
+    "Binormal": ("f4", 4),
+}
+
+
+@lru_cache(maxsize=None)
+def get_vertex_dtype(layout: tuple, component_sizes: tuple = None):
+    """Compile a structured dtype with one field per semantic of a vertex layout. component_sizes overrides
+    the number of values of each component, for layout types that store them differently."""
+    fields = []
+    for index, semantic in enumerate(layout):
+        component_type, size = VERTEX_COMPONENTS.get(semantic, ("f4", 4))
+        if component_sizes and len(component_sizes) == len(layout):
+            size = component_sizes[index]
+        fields.append((semantic.lower(), component_type, (size,)))
+    return np.dtype(fields)
+
+
 class VertexLayoutListProperty(ElementProperty):
     value_types = (list)
     tag_name = 'Layout'
@@ -340,6 +376,10 @@ class VertexLayoutListProperty(ElementProperty):
     def vertex_semantic(self):
         return "".join([item[0] for item in self.value])
 
+    @ property
+    def vertex_dtype(self):
+        return get_vertex_dtype(tuple(self.value))
+
     def __init__(self, tag_name=None):
         super().__init__(self.tag_name, [])
         self.type = 'GTAV1'
@@ -365,40 +405,63 @@ class VertexDataProperty(ElementProperty):
 
     def __init__(self, tag_name=None):
         super().__init__(tag_name=tag_name or 'Data', value=[])
+        self.component_sizes = None
 
     @ classmethod
     def from_xml(cls, element: ET.Element):
         new = cls()
-        if not element.text:
+        if not element.text or not element.text.strip():
             return new
 
-        text = element.text.strip().split('\n')
-        if len(text) > 0:
-            for line in text:
-                items = line.strip().split("   ")
-                vert = []
-                for item in items:
-                    words = item.strip().split(" ")
-                    # Convert item to correct type
-                    item = [get_str_type(word) for word in words]
-                    vert.append(item)
+        text = element.text.strip()
+        # Number of values of each component, taken from the first vertex
+        first_line = text.split('\n', 1)[0]
+        new.component_sizes = [len(item.split())
+                               for item in first_line.split("   ") if item.strip()]
+        stride = sum(new.component_sizes)
+
+        values = np.fromstring(text, sep=' ')
+        if stride == 0 or len(values) % stride != 0:
+            return cls.read_value_error(element)
 
-                new.value.append(vert)
+        # One row per vertex until the layout is applied
+        new.value = values.reshape(-1, stride)
 
         return new
 
+    def apply_layout(self, layout):
+        """Convert the parsed rows into a structured array with one field per layout semantic"""
+        if len(self.value) < 1:
+            return
+
+        dtype = get_vertex_dtype(
+            tuple(layout), tuple(self.component_sizes or ()))
+        vertices = np.empty(len(self.value), dtype=dtype)
+        column = 0
+        for name in dtype.names:
+            size = dtype[name].shape[0]
+            vertices[name] = self.value[:, column:column + size]
+            column += size
+
+        self.value = vertices
+
     def to_xml(self):
         if len(self.value) < 1:
             return None
 
         element = ET.Element(self.tag_name)
-        text = []
-        for vertex in self.value:
-            for property in vertex:
-                text.append(' '.join([str(item)
-                                      for item in property]) + '   ')
-            text.append('\n')
-        element.text = ''.join(text)
+        vertices = self.value
+        columns = []
+        line = []
+        for name in vertices.dtype.names:
+            column = vertices[name].reshape(len(vertices), -1)
+            # Same text as str() of each value, converted in bulk
+            columns.append(column.astype(str))
+            line.append(' '.join(['%s'] * column.shape[1]) + '   ')
+        line.append('\n')
+
+        values = np.hstack(columns).ravel().tolist()
+        element.text = (''.join(line) * len(vertices)) % tuple(values)
 
         return element
 
@@ -425,10 +488,10 @@ class VertexBuffer(ElementTree):
     @ classmethod
     def from_xml(cls: Element, element: ET.Element):
         new = super().from_xml(element)
-        # Convert data to namedtuple matching the layout
-        vert_type = new.get_vertex_type()
-        new.data = list(map(lambda vert: vert_type(*vert), new.data))
-        new.data2 = list(map(lambda vert: vert_type(*vert), new.data2))
+        # Convert data to a structured array matching the layout
+        layout = new.get_element('layout').value
+        new.get_element('data').apply_layout(layout)
+        new.get_element('data2').apply_layout(layout)
         return new
 
 
@@ -449,16 +512,18 @@ class IndexDataProperty(ElementProperty):
     def to_xml(self):
         element = ET.Element(self.tag_name)
         columns = 24
-        text = []
+        count = len(self.value)
 
-        for index, vert_index in enumerate(self.value):
-            text.append(str(vert_index))
-            if index < len(self.value) - 1:
-                text.append(' ')
-            if (index + 1) % columns == 0:
-                text.append('\n')
+        # Indices are separated by spaces with a line break after every row of columns
+        rows, remainder = divmod(count, columns)
+        text = ('%s ' * columns + '\n') * rows + '%s ' * remainder
+        if remainder:
+            text = text[:-1]
+        elif rows:
+            text = text[:-2] + '\n'
 
-        element.text = ''.join(text)
+        values = np.asarray(self.value).astype(str).tolist()
+        element.text = text % tuple(values)
 
         return element
 
@@ -578,12 +643,11 @@ class Drawable(ElementTree, AbstractClass):
 
         return new
 
-    def to_xml(self):
-        element = super().to_xml()
+    def get_xml_parts(self):
+        tag_name, attributes, children = super().get_xml_parts()
         for bound in self.bounds:
             bound.tag_name = "Bounds"
-            element.append(bound.to_xml())
-        return element
+        return tag_name, attributes, children + self.bounds
 
 
 class DrawableDictionary(MutableSequence, Element):
@@ -614,6 +678,11 @@ class DrawableDictionary(MutableSequence, Element):
     def sort(self, key):
         self._value.sort(key=key)
 
+    @classmethod
+    def stream_child_type(cls, tag):
+        if tag == "Item":
+            return Drawable
+
     @ classmethod
     def from_xml(cls, element: ET.Element):
         new = cls()
@@ -622,19 +691,20 @@ class DrawableDictionary(MutableSequence, Element):
 
         for child in children:
             print(child)
-            drawable = Drawable.from_xml(child)
+            drawable = from_xml_child(Drawable, child)
             new.append(drawable)
 
         return new
 
-    def to_xml(self):
-        element = ET.Element(self.tag_name)
+    def get_xml_parts(self):
         for drawable in self._value:
             if isinstance(drawable, Drawable):
                 drawable.tag_name = "Item"
-                element.append(drawable.to_xml())
             else:
                 raise TypeError(
                     f"{type(self).__name__}s can only hold '{Drawable.__name__}' objects, not '{type(drawable)}'!")
 
-        return element
+        return self.tag_name, {}, self._value
+
+    def to_xml(self):
+        return build_xml_element(self.get_xml_parts())
@@ -1,5 +1,8 @@
 import xml.etree.ElementTree as ET
 import os
+import hashlib
+import inspect
+import pickle
 from .codewalker_xml import *
 from .drawable import ParametersListProperty, VertexLayoutListProperty
 from ..tools.utils import *
@@ -58,26 +61,47 @@ class Shader(ElementTree):
                 return True
         return False
 
-    def get_layout_from_semantic(self, vertex_semantic, is_skinned=False):
+    def index_layouts(self):
+        """Index the layouts by vertex semantic for get_layout_from_semantic"""
+        self.layouts_by_semantic = {}
+        self.skinned_layout = None
         for layout in self.layouts:
-            if layout.vertex_semantic == vertex_semantic:
-                return layout
+            self.layouts_by_semantic.setdefault(layout.vertex_semantic, layout)
+            if self.skinned_layout is None and "BlendWeights" in layout.value:
+                self.skinned_layout = layout
+
+    def get_layout_from_semantic(self, vertex_semantic, is_skinned=False):
+        if self.layouts_by_semantic is None:
+            self.index_layouts()
+
+        layout = self.layouts_by_semantic.get(vertex_semantic)
+        if layout is not None:
+            return layout
         #error = f"{vertex_semantic} layout is not found in the shader '{self.name}'"
         #error += "\nThe possible layouts you can have are"
         # for l in self.layouts:
         #    error += f", {l.vertex_semantic}"
         #raise Exception(error)
-        if is_skinned:
-            for layout in self.layouts:
-                if "BlendWeights" in layout.value:
-                    return layout
+        if is_skinned and self.skinned_layout is not None:
+            return self.skinned_layout
 
         return self.layouts[0]
 
 
-class ShaderManager:
+class ShaderManagerMeta(type):
+    """Loads the shaders the first time they are accessed"""
+    @property
+    def shaders(cls):
+        if cls._shaders is None:
+            cls.load_shaders()
+        return cls._shaders
+
+
+class ShaderManager(metaclass=ShaderManagerMeta):
     shaderxml = os.path.join(os.path.dirname(__file__), "Shaders.xml")
-    shaders = {}
+    # Shaders parsed from shaderxml, keyed by the hash of the xml and of the modules defining the shader classes
+    shadercache = os.path.join(os.path.dirname(__file__), "Shaders.cache")
+    _shaders = None
     terrains = ["terrain_cb_w_4lyr.sps", "terrain_cb_w_4lyr_lod.sps", "terrain_cb_w_4lyr_spec.sps", "terrain_cb_w_4lyr_spec_pxm.sps", "terrain_cb_w_4lyr_pxm_spm.sps",
                 "terrain_cb_w_4lyr_pxm.sps", "terrain_cb_w_4lyr_cm_pxm.sps", "terrain_cb_w_4lyr_cm_tnt.sps", "terrain_cb_w_4lyr_cm_pxm_tnt.sps", "terrain_cb_w_4lyr_cm.sps",
                 "terrain_cb_w_4lyr_2tex.sps", "terrain_cb_w_4lyr_2tex_blend.sps", "terrain_cb_w_4lyr_2tex_blend_lod.sps", "terrain_cb_w_4lyr_2tex_blend_pxm.sps",
@@ -119,12 +143,46 @@ class ShaderManager:
     def cutout_shaders():
         return ShaderManager.cutouts + ShaderManager.veh_cutouts + ShaderManager.shadow_proxies
 
+    @staticmethod
+    def get_shaders_hash():
+        sha1 = hashlib.sha1()
+        for filepath in (ShaderManager.shaderxml, __file__, inspect.getfile(VertexLayoutListProperty), inspect.getfile(ElementTree)):
+            with open(filepath, "rb") as file:
+                sha1.update(file.read())
+        return sha1.hexdigest()
+
+    @staticmethod
+    def read_shader_cache(shaders_hash):
+        try:
+            with open(ShaderManager.shadercache, "rb") as file:
+                cache_hash, shaders = pickle.load(file)
+        except Exception:
+            return None
+        return shaders if cache_hash == shaders_hash else None
+
+    @staticmethod
+    def write_shader_cache(shaders_hash, shaders):
+        try:
+            with open(ShaderManager.shadercache, "wb") as file:
+                pickle.dump((shaders_hash, shaders), file,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+        except OSError:
+            # The add-on folder may not be writable, the shaders are parsed again next time
+            pass
+
     @staticmethod
     def load_shaders():
-        tree = ET.parse(ShaderManager.shaderxml)
-        for node in tree.getroot():
-            shader = Shader.from_xml(node)
-            ShaderManager.shaders[shader.name] = shader
+        shaders_hash = ShaderManager.get_shaders_hash()
+        shaders = ShaderManager.read_shader_cache(shaders_hash)
+        if shaders is None:
+            shaders = {}
+            for node in parse_xml(ShaderManager.shaderxml):
+                shader = Shader.from_xml(node)
+                shader.index_layouts()
+                shaders[shader.name] = shader
+            ShaderManager.write_shader_cache(shaders_hash, shaders)
+
+        ShaderManager._shaders = shaders
 
     @staticmethod
     def print_shader_collection():
@@ -242,6 +300,3 @@ class ShaderManager:
             result.append(res)
 
         print("\n".join(result))
-
-
-ShaderManager.load_shaders()
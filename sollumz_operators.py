@@ -1,8 +1,14 @@
 import traceback
 import os
+import sys
 import pathlib
+import multiprocessing
+from collections import deque
 from abc import abstractmethod
+from concurrent.futures import ProcessPoolExecutor, BrokenExecutor
+from functools import partial
 import bpy
+import numpy as np
 from bpy_extras.io_utils import ImportHelper, ExportHelper
 from .sollumz_helper import *
 from .sollumz_properties import SollumType, SOLLUMZ_UI_NAMES, BOUND_TYPES, SollumzExportSettings, SollumzImportSettings, TimeFlags
@@ -13,20 +19,20 @@ from .resources.navmesh import YNV
 from .resources.clipsdictionary import YCD
 from .resources.ytyp import YTYP
 from .resources.ymap import YMAP, EntityItem, CMapData
-from .ydr.ydrimport import import_ydr
-from .ydr.ydrexport import export_ydr
+from .ydr.ydrimport import import_ydr, clear_material_cache
+from .ydr.ydrexport import drawable_from_object
 from .ydd.yddimport import import_ydd
-from .ydd.yddexport import export_ydd
+from .ydd.yddexport import drawable_dict_from_object
 from .yft.yftimport import import_yft
-from .yft.yftexport import export_yft
+from .yft.yftexport import fragment_from_object, write_fragment
 from .ybn.ybnimport import import_ybn
-from .ybn.ybnexport import export_ybn
+from .ybn.ybnexport import boundfile_from_object
 from .ynv.ynvimport import import_ynv
 from .ycd.ycdimport import import_ycd
-from .ycd.ycdexport import export_ycd
+from .ycd.ycdexport import clip_dictionary_from_object
 from .tools.meshhelper import *
 from .tools.utils import *
-from .tools.blenderhelper import get_terrain_texture_brush
+from .tools.blenderhelper import get_terrain_texture_brush, build_name_object_map
 from .tools.ytyphelper import ytyp_from_objects
 
 
@@ -53,25 +59,25 @@ class SOLLUMZ_OT_import(SOLLUMZ_OT_base, bpy.types.Operator, ImportHelper):
     def draw(self, context):
         pass
 
-    def import_file(self, filepath, ext):
+    def import_file(self, filepath, ext, xml=None):
         try:
             valid_type = False
             if ext == YDR.file_extension:
-                import_ydr(filepath, self.import_settings)
+                import_ydr(filepath, self.import_settings, xml)
                 valid_type = True
             elif ext == YDD.file_extension:
-                import_ydd(self, filepath, self.import_settings)
+                import_ydd(self, filepath, self.import_settings, xml)
                 valid_type = True
             elif ext == YFT.file_extension:
-                import_yft(filepath, self.import_settings)
+                import_yft(filepath, self.import_settings, xml)
                 valid_type = True
             elif ext == YBN.file_extension:
-                import_ybn(filepath)
+                import_ybn(filepath, xml)
                 valid_type = True
             elif ext == YNV.file_extension:
-                import_ynv(filepath)
+                import_ynv(filepath, xml)
             elif ext == YCD.file_extension:
-                import_ycd(self, filepath, self.import_settings)
+                import_ycd(self, filepath, self.import_settings, xml)
 
             if valid_type:
                 self.message(f"Succesfully imported: {filepath}")
@@ -84,13 +90,19 @@ class SOLLUMZ_OT_import(SOLLUMZ_OT_base, bpy.types.Operator, ImportHelper):
 
     def run(self, context):
         result = False
+        # Identical shaders share one material across the drawables and files of this import
+        clear_material_cache()
         if self.import_settings.batch_mode == "DIRECTORY":
             folderpath = os.path.dirname(self.filepath)
+            files = []
             for file in os.listdir(folderpath):
                 ext = ''.join(pathlib.Path(file).suffixes)
                 if ext in self.filename_exts:
-                    filepath = os.path.join(folderpath, file)
-                    result = self.import_file(filepath, ext)
+                    files.append((os.path.join(folderpath, file), ext))
+
+            # Files are parsed ahead in worker processes while the main thread creates the Blender data
+            for (filepath, ext), xml in zip(files, parse_import_files(files)):
+                result = self.import_file(filepath, ext, xml)
         else:
             ext = ''.join(pathlib.Path(self.filepath).suffixes)
             result = self.import_file(self.filepath, ext)
@@ -101,6 +113,93 @@ class SOLLUMZ_OT_import(SOLLUMZ_OT_base, bpy.types.Operator, ImportHelper):
         return True
 
 
+"""Classes parsing each file type imported by SOLLUMZ_OT_import"""
+IMPORT_FILE_TYPES = {
+    YDR.file_extension: YDR,
+    YDD.file_extension: YDD,
+    YFT.file_extension: YFT,
+    YBN.file_extension: YBN,
+    YNV.file_extension: YNV,
+    YCD.file_extension: YCD,
+}
+
+def can_use_worker_processes(num_workers):
+    """Whether jobs can run in forked worker processes. Blender is only safe to fork on Linux, macOS frameworks
+    are not fork safe and Windows can't fork"""
+    return num_workers > 1 and sys.platform.startswith("linux")
+
+
+"""File types whose object models unpickle much faster than they parse, as they are mostly vertex and index arrays.
+The models of other types, like the polygons of a ybn, are many small objects that take more than half as long to
+unpickle in the main thread as to parse there. See tests/benchmark_import_parse.py."""
+WORKER_PARSED_FILE_TYPES = {
+    YDR.file_extension,
+    YDD.file_extension,
+    YCD.file_extension,
+}
+
+"""Size in bytes from which parsing a file in a worker process saves more than the fork and pickling cost"""
+WORKER_PARSE_MIN_FILE_SIZE = 1 << 20
+
+
+def parse_in_worker(filepath, ext):
+    """Whether parsing a file in a worker process pays off"""
+    if ext not in WORKER_PARSED_FILE_TYPES:
+        return False
+    try:
+        return os.path.getsize(filepath) >= WORKER_PARSE_MIN_FILE_SIZE
+    except OSError:
+        return False
+
+
+def parse_import_file(filepath, ext):
+    """Parse one file to import. Returns None if it failed, so the error is reported when it's imported"""
+    try:
+        return IMPORT_FILE_TYPES[ext].from_xml_file(filepath)
+    except:
+        return None
+
+
+def submit_import_file(executor, filepath, ext):
+    """Submit a file to the worker processes. Returns None if the pool can't take it"""
+    try:
+        return executor.submit(parse_import_file, filepath, ext)
+    except (BrokenExecutor, OSError):
+        return None
+
+
+def get_parsed_file(future):
+    """Get the object model a worker parsed, or None if the file is to be parsed during the import, because it
+    was not sent to a worker or the worker failed"""
+    if future is None:
+        return None
+    try:
+        return future.result()
+    except Exception:
+        return None
+
+
+def parse_import_files(files):
+    """Parse the large (filepath, extension) pairs in worker processes when the platform can fork them. Yields
+    the object model of each file in order, or None for files that are to be parsed during the import"""
+    worker_indices = deque(index for index, (filepath, ext) in enumerate(files)
+                           if parse_in_worker(filepath, ext))
+    num_workers = min(len(worker_indices), os.cpu_count() or 1)
+    if not can_use_worker_processes(num_workers):
+        yield from (None for _ in files)
+        return
+
+    with ProcessPoolExecutor(num_workers, mp_context=multiprocessing.get_context("fork")) as executor:
+        futures = {}
+        for index in range(len(files)):
+            # Only parse a few files ahead of the import, so parsed object models don't pile up in memory
+            while worker_indices and len(futures) < num_workers * 2:
+                worker_index = worker_indices.popleft()
+                futures[worker_index] = submit_import_file(
+                    executor, *files[worker_index])
+            yield get_parsed_file(futures.pop(index, None))
+
+
 class SOLLUMZ_OT_export(SOLLUMZ_OT_base, bpy.types.Operator):
     """Exports codewalker xml files"""
     bl_idname = "sollumz.export"
@@ -227,40 +326,74 @@ class SOLLUMZ_OT_export(SOLLUMZ_OT_base, bpy.types.Operator):
 
         return result
 
-    def export_object(self, obj):
+    def extract_object(self, obj):
+        """Extract obj from the scene into its XML object model. Returns the filepath to export to and a function
+        writing the object model to a filepath, or None if obj can't be exported"""
+        filepath = None
         try:
-            valid_type = False
-            filepath = None
             if obj.sollum_type == SollumType.DRAWABLE:
                 filepath = self.get_filepath(obj.name, YDR.file_extension)
-                export_ydr(self, obj, filepath, self.export_settings)
-                valid_type = True
+                drawable = drawable_from_object(
+                    self, obj, filepath, None, None, self.export_settings)
+                return filepath, drawable.write_xml
             elif obj.sollum_type == SollumType.DRAWABLE_DICTIONARY:
                 filepath = self.get_filepath(obj.name, YDD.file_extension)
-                export_ydd(self, obj, filepath, self.export_settings)
-                valid_type = True
+                drawable_dict = drawable_dict_from_object(
+                    self, obj, filepath, self.export_settings)
+                return filepath, drawable_dict.write_xml
             elif obj.sollum_type == SollumType.FRAGMENT:
                 self.export_settings.use_transforms = False
                 name = obj.name if "/" not in obj.name else obj.name.replace(
                     "pack:/", "")
                 filepath = self.get_filepath(name, YFT.file_extension)
-                export_yft(self, obj, filepath, self.export_settings)
-                valid_type = True
+                fragment = fragment_from_object(
+                    self, obj, filepath, self.export_settings)
+                return filepath, partial(write_fragment, fragment, export_with_hi=self.export_settings.export_with_hi)
             elif obj.sollum_type == SollumType.CLIP_DICTIONARY:
                 filepath = self.get_filepath(obj.name, YCD.file_extension)
-                export_ycd(self, obj, filepath, self.export_settings)
-                valid_type = True
+                clip_dictionary = clip_dictionary_from_object(
+                    self, obj, filepath, self.export_settings)
+                return filepath, clip_dictionary.write_xml
             elif obj.sollum_type in BOUND_TYPES:
                 filepath = self.get_filepath(obj.name, YBN.file_extension)
-                export_ybn(obj, filepath, self.export_settings)
-                valid_type = True
-            if valid_type:
-                self.message(f"Succesfully exported: {filepath}")
+                bound_file = boundfile_from_object(obj, self.export_settings)
+                return filepath, bound_file.write_xml
         except:
             self.error(
                 f"Error exporting: {filepath} \n {traceback.format_exc()}")
             return False
-        return True
+        return None
+
+    def extract_objects(self, objects):
+        """Extract the objects one at a time. Yields the (filepath, write function) job of each object that can be
+        exported"""
+        for obj in objects:
+            job = self.extract_object(obj)
+            if job:
+                yield job
+            # Dont show time on failure
+            elif job is False:
+                self.bl_showtime = False
+
+    def write_objects(self, jobs, num_objects):
+        """Write the object models of jobs as they are extracted, in parallel worker processes when the platform can
+        fork them. Only the XML writing runs in the workers, the object models are built on the main thread."""
+        num_workers = min(num_objects, os.cpu_count() or 1)
+        if can_use_worker_processes(num_workers):
+            results = write_export_jobs_in_workers(jobs, num_workers)
+        else:
+            # Each object model is written and dropped before the next object is extracted
+            results = ((filepath, write_export_job(filepath, write))
+                       for filepath, write in jobs)
+
+        result = True
+        for filepath, error in results:
+            if error:
+                self.error(f"Error exporting: {filepath} \n {error}")
+                result = False
+            else:
+                self.message(f"Succesfully exported: {filepath}")
+        return result
 
     def run(self, context):
         objects = self.get_only_parent_objs(self.collect_objects(context))
@@ -277,11 +410,9 @@ class SOLLUMZ_OT_export(SOLLUMZ_OT_base, bpy.types.Operator):
                 bpy.ops.object.mode_set(mode='OBJECT')
 
         if len(objects) > 0:
-            for obj in objects:
-                result = self.export_object(obj)
-                # Dont show time on failure
-                if not result:
-                    self.bl_showtime = False
+            # Blender data is only read on the main thread, writing the XML files can run in parallel
+            if not self.write_objects(self.extract_objects(objects), len(objects)):
+                self.bl_showtime = False
 
             if self.export_settings.export_with_ytyp:
                 ytyp = ytyp_from_objects(objects)
@@ -296,6 +427,52 @@ class SOLLUMZ_OT_export(SOLLUMZ_OT_base, bpy.types.Operator):
         return True
 
 
+def write_export_job(filepath, write):
+    """Write one extracted object model. Returns the traceback on failure"""
+    try:
+        write(filepath)
+    except:
+        return traceback.format_exc()
+    return None
+
+
+def submit_export_job(executor, filepath, write):
+    """Submit a job to the worker processes. Returns None if the pool can't take it"""
+    try:
+        return executor.submit(write_export_job, filepath, write)
+    except (BrokenExecutor, OSError):
+        return None
+
+
+def get_export_job_error(filepath, write, future):
+    """Get the error of a submitted job. Jobs the worker processes could not run, because the pool broke or
+    the object model could not be pickled, are written in process instead"""
+    if future is not None:
+        try:
+            return future.result()
+        except Exception:
+            pass
+    return write_export_job(filepath, write)
+
+
+def write_export_jobs_in_workers(jobs, num_workers):
+    """Write (filepath, write function) jobs in forked worker processes, which receive the pickled object models.
+    Jobs are submitted as they are extracted, with at most two per worker in flight, so extracted object models
+    don't pile up. Yields the (filepath, error) of each job in order."""
+    pending = deque()
+    with ProcessPoolExecutor(num_workers, mp_context=multiprocessing.get_context("fork")) as executor:
+        for filepath, write in jobs:
+            if len(pending) == num_workers * 2:
+                done_filepath, done_write, future = pending.popleft()
+                yield done_filepath, get_export_job_error(done_filepath, done_write, future)
+            pending.append(
+                (filepath, write, submit_export_job(executor, filepath, write)))
+
+        while pending:
+            done_filepath, done_write, future = pending.popleft()
+            yield done_filepath, get_export_job_error(done_filepath, done_write, future)
+
+
 class SOLLUMZ_OT_import_ymap(SOLLUMZ_OT_base, bpy.types.Operator, ImportHelper):
     """Imports .ymap.xml file exported from codewalker"""
     bl_idname = "sollumz.importymap"
@@ -339,11 +516,12 @@ class SOLLUMZ_OT_import_ymap(SOLLUMZ_OT_base, bpy.types.Operator, ImportHelper):
             ymap = YMAP.from_xml_file(self.filepath)
             found = False
             if ymap.entities:
-                for obj in context.collection.all_objects:
-                    for entity in ymap.entities:
-                        if(entity.archetype_name == obj.name and obj.name in context.view_layer.objects):
-                            found = True
-                            self.apply_entity_properties(obj, entity)
+                objects = build_name_object_map(
+                    context.collection.all_objects, context.view_layer)
+                for entity in ymap.entities:
+                    for obj in objects.get(entity.archetype_name, ()):
+                        found = True
+                        self.apply_entity_properties(obj, entity)
                 if found:
                     self.message(f"Succesfully imported: {self.filepath}")
                     return True
@@ -400,24 +578,23 @@ class SOLLUMZ_OT_export_ymap(SOLLUMZ_OT_base, bpy.types.Operator, ExportHelper):
         return entity
 
     def calculate_extents(self, objs):
-        emin = Vector((0, 0, 0))
-        emax = Vector((0, 0, 0))
-        smin = Vector((0, 0, 0))
-        smax = Vector((0, 0, 0))
-
-        for obj in objs:
-            loddist = obj.entity_properties.lod_dist
-            radius = get_obj_radius(obj)
-
-            bbmin = subtract_from_vector(obj.location, radius)
-            bbmax = add_to_vector(obj.location, radius)
-            sbmin = subtract_from_vector(bbmin, loddist)
-            sbmax = add_to_vector(bbmax, loddist)
-
-            emin = get_min_vector(emin, bbmin)
-            emax = get_max_vector(emax, bbmax)
-            smin = get_min_vector(smin, sbmin)
-            smax = get_max_vector(smax, sbmax)
+        bounds_cache = {}
+        locations = np.array([obj.location for obj in objs], dtype=np.float64)
+        radii = np.array([get_obj_radius(obj, bounds_cache=bounds_cache)
+                         for obj in objs], dtype=np.float64)[:, np.newaxis]
+        loddists = np.array([obj.entity_properties.lod_dist for obj in objs],
+                            dtype=np.float64)[:, np.newaxis]
+
+        bbmin = locations - radii
+        bbmax = locations + radii
+        sbmin = bbmin - loddists
+        sbmax = bbmax + loddists
+
+        # The extents always include the origin
+        emin = Vector(np.minimum(bbmin.min(axis=0), 0))
+        emax = Vector(np.maximum(bbmax.max(axis=0), 0))
+        smin = Vector(np.minimum(sbmin.min(axis=0), 0))
+        smax = Vector(np.maximum(sbmax.max(axis=0), 0))
 
         return emin, emax, smin, smax
 
@@ -0,0 +1,11 @@
+import os
+import pytest
+
+ADDON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def pytest_collect_directory(path, parent):
+    # The addon's __init__ registers it with Blender, so its folder is collected as a plain directory instead
+    # of a package pytest would import
+    if str(path) == ADDON_DIR:
+        return pytest.Dir.from_parent(parent, path=path)
@@ -0,0 +1,67 @@
+"""Benchmark of parsing files to import in the main thread against parsing them in a worker process.
+
+    python tests/benchmark_import_parse.py path/to/file.ydr.xml [path/to/file.ybn.xml ...]
+
+A file parsed in a worker process costs the main thread the unpickling of its object model, where parsing it
+in process costs the parse. For every file, this times from_xml_file and the pickle round trip of the object
+model a worker sends back. The worker pays off when unpickling is much faster than parsing, see
+WORKER_PARSED_FILE_TYPES and WORKER_PARSE_MIN_FILE_SIZE in sollumz_operators.py."""
+import os
+import pickle
+import sys
+import time
+from conftest import load_addon_package
+
+load_addon_package()
+
+from sollumz.resources.drawable import Drawable, DrawableDictionary
+from sollumz.resources.fragment import Fragment
+from sollumz.resources.clipsdictionary import ClipsDictionary
+from sollumz.resources.bound import BoundFile
+
+"""Root element class of each file type"""
+FILE_TYPES = {
+    ".ydr.xml": Drawable,
+    ".ydd.xml": DrawableDictionary,
+    ".yft.xml": Fragment,
+    ".ycd.xml": ClipsDictionary,
+    ".ybn.xml": BoundFile,
+}
+
+
+def get_file_type(filepath):
+    for extension, file_type in FILE_TYPES.items():
+        if filepath.endswith(extension):
+            return file_type
+    raise ValueError(f"Unknown file type of '{filepath}'!")
+
+
+def time_best(function, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main(filepaths, repeat=3):
+    print(f"{'file':<24}{'size':>10}{'parse':>9}{'pickle':>9}{'unpickle':>10}  worker")
+    for filepath in filepaths:
+        file_type = get_file_type(filepath)
+        # Compiles the classes before they are timed
+        file_type.from_xml_file(filepath)
+
+        parse_time, obj = time_best(
+            lambda: file_type.from_xml_file(filepath), repeat)
+        dump_time, data = time_best(lambda: pickle.dumps(
+            obj, pickle.HIGHEST_PROTOCOL), repeat)
+        load_time, _ = time_best(lambda: pickle.loads(data), repeat)
+        # The main thread saves the parse and pays the unpickling
+        saved = parse_time - load_time
+        print(f"{os.path.basename(filepath):<24}{os.path.getsize(filepath) / 1e6:>8.2f}MB{parse_time:>8.3f}s"
+              f"{dump_time:>8.3f}s{load_time:>9.3f}s  {'saves' if saved > 0 else 'costs'} {abs(saved):.3f}s")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
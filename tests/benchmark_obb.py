@@ -0,0 +1,105 @@
+"""Benchmark of fitting polygon bound boxes with obb.fit_obb against the sampled rotation search it replaced.
+
+    python tests/benchmark_obb.py
+
+The old get_obb measured the axis aligned box of the hull in 14400 rotations, 40 angles around each of 360
+axes, and kept the smallest. It is replayed here with all rotations evaluated at once with numpy, which is
+faster than the old loop over mathutils matrices, so the old times printed are a lower bound."""
+import math
+import time
+from itertools import combinations
+import numpy as np
+from conftest import load_addon_package
+
+load_addon_package()
+
+from sollumz.tools import obb
+
+
+def get_rotation(axis, angle):
+    """Get the 3x3 matrix rotating by angle around the unit axis, like mathutils.Matrix.Rotation"""
+    x, y, z = axis
+    c, s = math.cos(angle), math.sin(angle)
+    t = 1 - c
+    return ((t * x * x + c, t * x * y - s * z, t * x * z + s * y),
+            (t * x * y + s * z, t * y * y + c, t * y * z - s * x),
+            (t * x * z - s * y, t * y * z + s * x, t * z * z + c))
+
+
+def get_sampled_rotations():
+    """Get the rotations the old get_obb tried, in the same order"""
+    phi = (1 + 5 ** 0.5) / 2
+    rotations = []
+    for i in range(0, 360):
+        theta = math.radians(i)
+        axis = (math.cos(theta) * math.sin(phi),
+                math.sin(theta) * math.sin(phi), math.cos(phi))
+        for n in range(0, 40):
+            rotations.append(get_rotation(axis, math.pi / 2 * n / 40))
+    return np.array(rotations, dtype=np.float64)
+
+
+SAMPLED_ROTATIONS = get_sampled_rotations()
+
+
+def get_sampled_min_volume(points):
+    """Get the volume of the box the old get_obb fit around points"""
+    volume = np.prod(points.max(axis=0) - points.min(axis=0))
+    for rotations in np.array_split(SAMPLED_ROTATIONS, 20):
+        volume, _, _, _ = obb.get_min_volume_box(
+            points, rotations, (volume, None, None, None))
+    return volume
+
+
+def get_hull(points):
+    """Get the points on the convex hull of points and the normals of its faces, by checking every triangle"""
+    hull_indices = set()
+    normals = []
+    for i, j, k in combinations(range(len(points)), 3):
+        normal = np.cross(points[j] - points[i], points[k] - points[i])
+        if np.linalg.norm(normal) < 1e-12:
+            continue
+        distances = (points - points[i]) @ normal
+        if np.all(distances <= 1e-9) or np.all(distances >= -1e-9):
+            hull_indices.update((i, j, k))
+            normals.append(normal)
+    return points[sorted(hull_indices)], np.array(normals, dtype=np.float64).reshape(-1, 3)
+
+
+def get_test_hulls(seed=0):
+    """Get (name, points, normals) of a few randomly rotated hulls"""
+    rng = np.random.default_rng(seed)
+    clouds = {
+        "stretched cloud": rng.normal(size=(30, 3)) * (3, 1, 0.4),
+        "noisy box": np.concatenate((np.array(np.meshgrid((-2, 2), (-1, 1), (-0.3, 0.3))).reshape(3, -1).T,
+                                     rng.uniform(-0.25, 0.25, (12, 3)))) + rng.normal(scale=0.01, size=(20, 3)),
+        "ellipsoid": rng.normal(size=(40, 3)),
+        "flat": rng.normal(size=(25, 3)) * (2, 1, 0),
+    }
+    clouds["ellipsoid"] *= (3, 1, 0.5) / np.linalg.norm(clouds["ellipsoid"], axis=1)[:, np.newaxis]
+
+    for name, points in clouds.items():
+        rotation, _ = np.linalg.qr(rng.normal(size=(3, 3)))
+        points, normals = get_hull(points @ rotation.T)
+        yield name, points, normals
+
+
+def main(repeat=3):
+    print(f"{'hull':<18}{'points':>7}{'sampled':>11}{'calipers':>11}{'sampled volume':>16}{'calipers volume':>17}")
+    for name, points, normals in get_test_hulls():
+        sampled_time = fit_time = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            sampled_volume = get_sampled_min_volume(points)
+            sampled_time = min(sampled_time, time.perf_counter() - start)
+
+            start = time.perf_counter()
+            _, bbmin, bbmax = obb.fit_obb(points, normals)
+            fit_time = min(fit_time, time.perf_counter() - start)
+        fit_volume = np.prod(bbmax - bbmin)
+        print(f"{name:<18}{len(points):>7}{sampled_time:>10.4f}s{fit_time:>10.4f}s"
+              f"{sampled_volume:>16.4f}{fit_volume:>17.4f}")
+
+
+if __name__ == "__main__":
+    main()
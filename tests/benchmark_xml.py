@@ -0,0 +1,113 @@
+"""Microbenchmark of parsing a ydr and reading its properties.
+
+    python tests/benchmark_xml.py path/to/file.ydr.xml
+
+Times YDR.from_xml_file followed by a traversal that reads every property of every ElementTree in the
+drawable, once through the PropertyValue descriptors and once with the ElementTree.__getattribute__ and
+__setattr__ overrides the descriptors replaced installed again on top of them. The overrides are
+reinstalled on the same classes, so both runs parse into the same object model."""
+import sys
+import time
+from contextlib import contextmanager
+from conftest import load_addon_package
+
+load_addon_package()
+
+from sollumz.resources.codewalker_xml import ElementTree, ElementProperty, AttributeProperty, ListProperty
+from sollumz.resources.drawable import YDR
+
+
+def legacy_getattribute(self, key: str, onlyValue: bool = True):
+    """ElementTree.__getattribute__ before the descriptors"""
+    obj = None
+    try:
+        obj = object.__getattribute__(self, key)
+        if isinstance(obj, (ElementProperty, AttributeProperty)) and onlyValue:
+            return obj.value
+        else:
+            return obj
+    except AttributeError:
+        return None
+
+
+def legacy_setattr(self, name: str, value) -> None:
+    """ElementTree.__setattr__ before the descriptors"""
+    obj = self.__getattribute__(name, False)
+    if obj and isinstance(obj, (ElementProperty, AttributeProperty)) and not isinstance(value, (ElementProperty, AttributeProperty)):
+        obj.value = value
+        object.__setattr__(self, name, obj)
+    else:
+        object.__setattr__(self, name, value)
+
+
+def get_subclasses(cls):
+    for subclass in cls.__subclasses__():
+        yield subclass
+        yield from get_subclasses(subclass)
+
+
+@contextmanager
+def legacy_access():
+    """Route attribute reads and writes of all ElementTree classes through the old overrides"""
+    classes = [ElementTree, *set(get_subclasses(ElementTree))]
+    setattrs = {cls: cls.__dict__.get("__setattr__") for cls in classes}
+    ElementTree.__getattribute__ = legacy_getattribute
+    for cls in classes:
+        cls.__setattr__ = legacy_setattr
+    try:
+        yield
+    finally:
+        del ElementTree.__getattribute__
+        for cls, setattr_function in setattrs.items():
+            if setattr_function is None:
+                del cls.__setattr__
+            else:
+                cls.__setattr__ = setattr_function
+
+
+def read_properties(obj):
+    """Read every property of obj and of the ElementTrees below it. Returns the number of reads."""
+    if isinstance(obj, ListProperty):
+        return sum(read_properties(item) for item in obj.value)
+    if not isinstance(obj, ElementTree):
+        return 0
+
+    num_reads = 0
+    for name in type(obj)._property_names:
+        getattr(obj, name)
+        num_reads += 1
+        num_reads += read_properties(obj.__dict__[name])
+    return num_reads
+
+
+def time_parse_and_traversal(filepath, repeat):
+    """Get the best parse and traversal times of repeat runs, and the number of property reads"""
+    parse_time = traversal_time = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        drawable = YDR.from_xml_file(filepath)
+        parsed = time.perf_counter()
+        num_reads = read_properties(drawable)
+        parse_time = min(parse_time, parsed - start)
+        traversal_time = min(traversal_time, time.perf_counter() - parsed)
+    return parse_time, traversal_time, num_reads
+
+
+def main(filepath, repeat=3):
+    # Compiles the classes before they are timed
+    YDR.from_xml_file(filepath)
+
+    parse_time, traversal_time, num_reads = time_parse_and_traversal(
+        filepath, repeat)
+    with legacy_access():
+        legacy_parse_time, legacy_traversal_time, _ = time_parse_and_traversal(
+            filepath, repeat)
+
+    print(f"{'':<26}{'parse':>10}{'traversal':>12}")
+    print(f"{'descriptors':<26}{parse_time:>9.3f}s{traversal_time:>11.3f}s")
+    print(f"{'__getattribute__ override':<26}{legacy_parse_time:>9.3f}s{legacy_traversal_time:>11.3f}s")
+    print(f"{num_reads} property reads per traversal")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1])
@@ -0,0 +1,74 @@
+"""Benchmark of reading and writing CodeWalker XML files with the lxml and the standard library backends.
+
+    python tests/benchmark_xml_backends.py [path/to/file.ydr.xml path/to/file.yft.xml ...]
+
+Without arguments, the samples in tests/data are used. Every file is read with from_xml_file and written
+with write_xml under set_xml_backend("lxml") and set_xml_backend("stdlib"), and the written files are
+compared."""
+import os
+import sys
+import tempfile
+import time
+from conftest import load_addon_package
+
+load_addon_package()
+
+from sollumz.resources.codewalker_xml import set_xml_backend
+from sollumz.resources.drawable import Drawable, DrawableDictionary
+from sollumz.resources.fragment import Fragment
+from sollumz.resources.clipsdictionary import ClipsDictionary
+from sollumz.resources.bound import BoundFile
+
+"""Root element class of each file type"""
+FILE_TYPES = {
+    ".ydr.xml": Drawable,
+    ".ydd.xml": DrawableDictionary,
+    ".yft.xml": Fragment,
+    ".ycd.xml": ClipsDictionary,
+    ".ybn.xml": BoundFile,
+}
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+
+
+def get_file_type(filepath):
+    for extension, file_type in FILE_TYPES.items():
+        if filepath.endswith(extension):
+            return file_type
+    raise ValueError(f"Unknown file type of '{filepath}'!")
+
+
+def time_backend(filepath, backend, out_filepath, repeat):
+    """Get the best read and write times of repeat runs, and the written file"""
+    set_xml_backend(backend)
+    file_type = get_file_type(filepath)
+    read_time = write_time = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        obj = file_type.from_xml_file(filepath)
+        read = time.perf_counter()
+        obj.write_xml(out_filepath)
+        read_time = min(read_time, read - start)
+        write_time = min(write_time, time.perf_counter() - read)
+
+    with open(out_filepath, "rb") as file:
+        return read_time, write_time, file.read()
+
+
+def main(filepaths, repeat=3):
+    print(f"{'file':<28}{'backend':<9}{'read':>9}{'write':>9}")
+    with tempfile.TemporaryDirectory() as out_dir:
+        for filepath in filepaths:
+            name = os.path.basename(filepath)
+            written = set()
+            for backend in ("lxml", "stdlib"):
+                read_time, write_time, output = time_backend(
+                    filepath, backend, os.path.join(out_dir, name), repeat)
+                written.add(output)
+                print(
+                    f"{name:<28}{backend:<9}{read_time:>8.3f}s{write_time:>8.3f}s")
+            print(f"{name:<28}{'identical' if len(written) == 1 else 'DIFFERENT'} output")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:] or [os.path.join(DATA_DIR, name) for name in sorted(os.listdir(DATA_DIR))])
@@ -0,0 +1,18 @@
+import os
+import sys
+import types
+
+"""Name the addon modules are imported under. The addon's own __init__ registers it with Blender, so the tests
+import its modules through a package that only points at the addon folder."""
+ADDON_PACKAGE = "sollumz"
+ADDON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_addon_package():
+    if ADDON_PACKAGE not in sys.modules:
+        package = types.ModuleType(ADDON_PACKAGE)
+        package.__path__ = [ADDON_DIR]
+        sys.modules[ADDON_PACKAGE] = package
+
+
+load_addon_package()
@@ -0,0 +1,23 @@
+import pytest
+
+pytest.importorskip("mathutils")
+
+from xml.etree import ElementTree as ET
+from sollumz.resources.bound import OctantsProperty
+
+
+def test_octants_are_comma_separated_lines():
+    element = OctantsProperty("Octants", [[0, 1, 2], [3], [], [4, 5]]).to_xml()
+
+    assert element.text == "\n0, 1, 2\n3\n\n4, 5\n"
+
+
+@pytest.mark.parametrize("octants", [[[0, 1, 2], [3], [], [4, 5]], [[], [1], []]])
+def test_octants_round_trip(octants):
+    assert OctantsProperty.from_xml(OctantsProperty("Octants", octants).to_xml()).value == octants
+
+
+def test_indented_octants():
+    element = ET.fromstring("<Octants>\n      0, 1, 2\n      3\n    </Octants>")
+
+    assert OctantsProperty.from_xml(element).value == [[0, 1, 2], [3]]
@@ -0,0 +1,53 @@
+import inspect
+import pytest
+
+pytest.importorskip("mathutils")
+
+from xml.etree import ElementTree as ET
+from sollumz.resources.clipsdictionary import ItemTypeListProperty
+from sollumz.resources.codewalker_xml import ElementTree, ValueProperty
+
+
+def get_item_types(cls):
+    for subclass in cls.__subclasses__():
+        yield subclass
+        yield from get_item_types(subclass)
+
+
+@pytest.mark.parametrize("item_type", [item_type for item_type in get_item_types(ItemTypeListProperty.Item)
+                                       if not inspect.isabstract(item_type)], ids=lambda item_type: item_type.__qualname__)
+def test_first_instance_matches_compiled_instances(item_type):
+    # The first instance compiles the class, assignments in its __init__ must set property values
+    first = ET.tostring(item_type().to_xml())
+    second = ET.tostring(item_type().to_xml())
+
+    assert first == second
+    assert b"<Type " in first
+
+
+def test_subclass_created_during_first_init_of_its_parent():
+    class Parent(ElementTree):
+        tag_name = "Parent"
+
+        def __init__(self):
+            super().__init__()
+            self.value = ValueProperty("Value")
+            self.value = 1
+            if type(self) is Parent:
+                self.child = Child()
+
+    class Child(Parent):
+        tag_name = "Child"
+
+        def __init__(self):
+            super().__init__()
+            self.value = 2
+
+    for _ in range(2):
+        assert ET.tostring(Parent().to_xml()) == \
+            b'<Parent><Value value="1" /><Child><Value value="2" /></Child></Parent>'
+        assert ET.tostring(Child().to_xml()) == b'<Child><Value value="2" /></Child>'
+
+    # Compiled classes assign through the descriptors
+    assert Parent.__setattr__ is object.__setattr__
+    assert Child.__setattr__ is object.__setattr__
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("mathutils")
+pytest.importorskip("bmesh")
+
+from sollumz.tools import obb
+
+
+def get_rectangle_area(points, direction):
+    along = points @ direction
+    across = points @ (-direction[1], direction[0])
+    return np.ptp(along) * np.ptp(across)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_calipers_find_the_minimum_area_rectangle(seed):
+    points = np.random.default_rng(seed).normal(size=(40, 2)) * (3, 1)
+    hull = obb.convex_hull_2d(map(tuple, points.tolist()))
+    edges = np.diff(hull + hull[:1], axis=0)
+    edges /= np.linalg.norm(edges, axis=1)[:, np.newaxis]
+
+    area = get_rectangle_area(points, np.array(obb.get_min_area_direction(hull)))
+
+    assert area == pytest.approx(min(get_rectangle_area(points, edge) for edge in edges))
+
+
+def test_fit_obb_of_a_rotated_box():
+    rng = np.random.default_rng(0)
+    corners = np.array(np.meshgrid((-2, 2), (-1, 1), (-0.5, 0.5))).reshape(3, -1).T
+    points = np.concatenate((corners, rng.uniform(-0.4, 0.4, (20, 3))))
+    rotation, _ = np.linalg.qr(rng.normal(size=(3, 3)))
+    points = points @ rotation.T
+    normals = np.concatenate((rotation.T, -rotation.T))
+
+    box_rotation, bbmin, bbmax = obb.fit_obb(points, normals)
+
+    assert np.linalg.det(box_rotation) == pytest.approx(1)
+    assert np.prod(bbmax - bbmin) == pytest.approx(8)
+    projected = points @ box_rotation.T
+    assert np.all(projected >= bbmin - 1e-9) and np.all(projected <= bbmax + 1e-9)
+
+
+def test_fit_obb_is_not_larger_than_the_sampled_rotation_search():
+    from benchmark_obb import get_test_hulls, get_sampled_min_volume
+
+    for _, points, normals in get_test_hulls():
+        _, bbmin, bbmax = obb.fit_obb(points, normals)
+
+        assert np.prod(bbmax - bbmin) <= get_sampled_min_volume(points) * (1 + 1e-9)
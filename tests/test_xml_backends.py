@@ -0,0 +1,35 @@
+import os
+import pytest
+
+pytest.importorskip("mathutils")
+pytest.importorskip("lxml")
+
+from sollumz.resources import codewalker_xml
+from sollumz.resources.drawable import Drawable
+from sollumz.resources.fragment import Fragment
+from sollumz.resources.clipsdictionary import ClipsDictionary
+from sollumz.resources.bound import BoundFile
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+
+SAMPLES = {
+    "sample.ydr.xml": Drawable,
+    "sample.yft.xml": Fragment,
+    "sample.ycd.xml": ClipsDictionary,
+    "sample.ybn.xml": BoundFile,
+}
+
+
+@pytest.mark.parametrize("stream", (True, False), ids=("stream", "tree"))
+@pytest.mark.parametrize("filename", SAMPLES)
+def test_backends_write_identical_files(filename, stream, tmp_path, monkeypatch):
+    written = {}
+    for backend in ("stdlib", "lxml"):
+        monkeypatch.setattr(codewalker_xml, "XML_BACKEND", backend)
+        obj = SAMPLES[filename].from_xml_file(
+            os.path.join(DATA_DIR, filename), stream)
+        filepath = tmp_path / f"{backend}.{filename}"
+        obj.write_xml(filepath)
+        written[backend] = filepath.read_bytes()
+
+    assert written["lxml"] == written["stdlib"]
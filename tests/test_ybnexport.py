@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("mathutils")
+pytest.importorskip("bpy")
+
+from sollumz.ybn import ybnexport
+
+
+def get_octants_brute_force(vertices):
+    octants = []
+    for direction in ybnexport.OCTANT_DIRECTIONS:
+        points = vertices * direction
+        octant = []
+        for i, point in enumerate(points):
+            covered = (points >= point).all(axis=1)
+            # Of equal vertices, the first is kept
+            covered[i:] &= (points[i:] != point).any(axis=1)
+            if not covered.any():
+                octant.append(i)
+        octants.append(octant)
+    return octants
+
+
+def test_octants_without_vertices():
+    assert ybnexport.get_octants([]) == [[]] * 8
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_octants(seed):
+    vertices = np.random.default_rng(seed).integers(-3, 4, (60, 3)).astype(np.float64)
+
+    assert ybnexport.get_octants(vertices) == get_octants_brute_force(vertices)
@@ -0,0 +1,122 @@
+from types import SimpleNamespace
+import numpy as np
+import pytest
+
+pytest.importorskip("mathutils")
+pytest.importorskip("bpy")
+
+from sollumz.resources.drawable import ShaderGroupProperty, ShaderItem, TextureShaderParameter, VectorShaderParameter
+from sollumz.ydr import ydrimport
+
+
+class ShaderNodeTexImage(SimpleNamespace):
+    pass
+
+
+class ShaderNodeValue(SimpleNamespace):
+    pass
+
+
+class Materials(dict):
+    def new(self, name):
+        material = SimpleNamespace(name=name, shader_properties=SimpleNamespace(),
+                                   node_tree=SimpleNamespace(nodes=[]))
+        # Blender makes names unique
+        while material.name in self:
+            material.name += ".001"
+        self[material.name] = material
+        return material
+
+
+@pytest.fixture
+def fake_bpy(monkeypatch):
+    """Just the parts of bpy shadergroup_to_materials uses"""
+    materials = Materials()
+    addon_key = ydrimport.__name__.split('.')[0]
+    bpy = SimpleNamespace(
+        context=SimpleNamespace(preferences=SimpleNamespace(addons={addon_key: SimpleNamespace(
+            preferences=SimpleNamespace(shared_texture_folder=""))})),
+        data=SimpleNamespace(images=[], materials=materials),
+        types=SimpleNamespace(ShaderNodeTexImage=ShaderNodeTexImage, ShaderNodeValue=ShaderNodeValue))
+
+    def create_shader(name, filename):
+        material = materials.new(name)
+        material.node_tree.nodes.extend(ShaderNodeValue(name=f"matMaterialColorScale_{key}",
+                                                        outputs=[SimpleNamespace(default_value=0)])
+                                        for key in "xyzw")
+        return material
+
+    monkeypatch.setattr(ydrimport, "bpy", bpy)
+    monkeypatch.setattr(ydrimport, "create_shader", create_shader)
+    monkeypatch.setattr(ydrimport, "get_detail_extra_sampler",
+                        lambda material: None)
+    monkeypatch.setattr(ydrimport, "get_shared_texture_paths",
+                        lambda shared_folder: {})
+    ydrimport.clear_material_cache()
+    yield materials
+    ydrimport.clear_material_cache()
+
+
+def create_shader_group(color_scale_x):
+    shader = ShaderItem()
+    shader.name = "default"
+    shader.filename = "default.sps"
+    texture = TextureShaderParameter()
+    texture.name = "DiffuseSampler"
+    texture.texture_name = "tex1"
+    vector = VectorShaderParameter()
+    vector.name = "matMaterialColorScale"
+    vector.x = color_scale_x
+    shader.parameters = [texture, vector]
+
+    shader_group = ShaderGroupProperty()
+    shader_group.shaders = [shader]
+    return shader_group
+
+
+def test_drawables_share_materials_of_identical_shaders(fake_bpy):
+    first = ydrimport.shadergroup_to_materials(
+        create_shader_group(1), "a.ydr.xml")
+    second = ydrimport.shadergroup_to_materials(
+        create_shader_group(1), "b.ydr.xml")
+
+    assert second[0] is first[0]
+    assert len(fake_bpy) == 1
+
+
+def test_shaders_with_different_parameters_get_their_own_material(fake_bpy):
+    first = ydrimport.shadergroup_to_materials(
+        create_shader_group(1), "a.ydr.xml")
+    second = ydrimport.shadergroup_to_materials(
+        create_shader_group(0.5), "b.ydr.xml")
+
+    assert second[0] is not first[0]
+    assert second[0].node_tree.nodes[0].outputs[0].default_value == 0.5
+
+
+class VertexGroups(list):
+    def new(self, name):
+        group = SimpleNamespace(name=name, weights={})
+        group.add = lambda indices, weight, mode: group.weights.update(
+            dict.fromkeys(indices, weight))
+        self.append(group)
+        return group
+
+
+def test_vertex_groups_of_unweighted_vertices():
+    obj = SimpleNamespace(vertex_groups=VertexGroups())
+    ydrimport.create_vertex_groups(
+        obj, np.zeros((3, 4), dtype=np.uint8), np.zeros((3, 4), dtype=np.uint8))
+
+    assert obj.vertex_groups == []
+
+
+def test_vertex_groups_add_up_influences_of_the_same_bone():
+    obj = SimpleNamespace(vertex_groups=VertexGroups())
+    weights = np.array([[255, 0, 0, 0], [100, 100, 55, 0]], dtype=np.uint8)
+    indices = np.array([[2, 0, 0, 0], [2, 2, 0, 0]], dtype=np.uint8)
+    ydrimport.create_vertex_groups(obj, weights, indices)
+
+    assert [group.name for group in obj.vertex_groups] == ["UNK", "UNK"]
+    assert obj.vertex_groups[0].weights == {1: 55 / 255}
+    assert obj.vertex_groups[1].weights == {0: 1, 1: 200 / 255}
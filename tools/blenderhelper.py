@@ -225,3 +225,17 @@ def get_armature_obj(armature):
     for obj in bpy.data.objects:
         if obj.data == armature:
             return obj
+
+
+def build_name_object_map(objects, view_layer=None):
+    """Build a map of name -> objects with that name, in the order of objects. Only objects in view_layer are
+    included if it's given."""
+    if view_layer is not None:
+        view_layer_names = {obj.name for obj in view_layer.objects}
+
+    name_object_map = {}
+    for obj in objects:
+        if view_layer is None or obj.name in view_layer_names:
+            name_object_map.setdefault(obj.name, []).append(obj)
+
+    return name_object_map
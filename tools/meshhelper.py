@@ -1,5 +1,6 @@
 import bpy
 import bmesh
+import numpy as np
 from mathutils import Vector, Matrix
 from mathutils.geometry import distance_point_to_plane
 from math import radians
@@ -203,24 +204,71 @@ def create_plane():
     return pl_obj
 
 
+def create_triangle_mesh(mesh, vertices, triangles):
+    """Fill mesh with the given vertex positions and triangles (vertex index triplets)"""
+    vertices = np.asarray(vertices, dtype=np.float32).reshape(-1, 3)
+    loop_vertex_indices = np.asarray(triangles, dtype=np.int32).ravel()
+    num_loops = len(loop_vertex_indices)
+
+    mesh.vertices.add(len(vertices))
+    mesh.vertices.foreach_set("co", vertices.ravel())
+    mesh.loops.add(num_loops)
+    mesh.loops.foreach_set("vertex_index", loop_vertex_indices)
+    mesh.polygons.add(num_loops // 3)
+    mesh.polygons.foreach_set(
+        "loop_start", np.arange(0, num_loops, 3, dtype=np.int32))
+    mesh.polygons.foreach_set(
+        "loop_total", np.full(num_loops // 3, 3, dtype=np.int32))
+    mesh.update(calc_edges=True)
+
+
+def get_foreach_array(collection, attribute, size=1, dtype=np.float32):
+    """Read attribute of every item in a bpy collection with foreach_get, as an array of shape (len(collection), size)"""
+    values = np.empty(len(collection) * size, dtype=dtype)
+    collection.foreach_get(attribute, values)
+    return values.reshape(-1, size)
+
+
+def get_loop_vertex_indices(mesh):
+    return get_foreach_array(mesh.loops, "vertex_index", dtype=np.int32).ravel()
+
+
+def weld_positions(positions):
+    """Merge equal positions, treating -0.0 and 0.0 as the same value. Returns the unique positions in order of
+    first use and the index into them of every input position"""
+    positions = np.ascontiguousarray(
+        np.asarray(positions, dtype=np.float32).reshape(-1, 3) + np.float32(0.0))
+    keys = positions.view(
+        np.dtype((np.void, positions.dtype.itemsize * 3))).ravel()
+    _, first_indices, inverse = np.unique(
+        keys, return_index=True, return_inverse=True)
+
+    order = np.argsort(first_indices, kind="stable")
+    new_indices = np.empty(len(order), dtype=np.int64)
+    new_indices[order] = np.arange(len(order))
+
+    return positions[first_indices[order]], new_indices[inverse.ravel()]
+
+
 def create_uv_layer(mesh, num, name, texcoords, flip_uvs=True):
     mesh.uv_layers.new()
     uv_layer = mesh.uv_layers[num]
     uv_layer.name = name
-    for i in range(len(uv_layer.data)):
-        uv = texcoords[mesh.loops[i].vertex_index]
-        if flip_uvs:
-            uv = flip_uv(uv)
-        uv_layer.data[i].uv = uv
+    # Gather the per-vertex coordinates of every loop
+    uvs = np.asarray(texcoords, dtype=np.float32).reshape(-1, 2)[
+        get_loop_vertex_indices(mesh)]
+    if flip_uvs:
+        uvs[:, 1] = 1.0 - uvs[:, 1]
+    uv_layer.data.foreach_set("uv", uvs.ravel())
 
 
 def create_vertexcolor_layer(mesh, num, name, colors):
     mesh.vertex_colors.new(name="Vertex Colors " + str(num))
     color_layer = mesh.vertex_colors[num]
     color_layer.name = name
-    for i in range(len(color_layer.data)):
-        rgba = colors[mesh.loops[i].vertex_index]
-        color_layer.data[i].color = divide_list(rgba, 255)
+    rgba = np.asarray(colors, dtype=np.float32).reshape(-1, 4)[
+        get_loop_vertex_indices(mesh)] / 255
+    color_layer.data.foreach_set("color", rgba.ravel())
 
 
 def flip_uv(uv):
@@ -249,11 +297,42 @@ def get_short_long_edge(bbmin, bbmax):
 """Get min and max bounds for an object and all of its children"""
 
 
-def get_bound_extents(obj, world=True, margin=0):
-    corners = get_total_bounds(obj, world)
-    min = subtract_from_vector(get_min_vector_list(corners), margin)
-    max = add_to_vector(get_max_vector_list(corners), margin)
-    return min, max
+def get_bound_extents(obj, world=True, margin=0, bounds_cache=None):
+    bounds = get_total_bounds_array(obj, world, bounds_cache)
+    if bounds is None:
+        raise ValueError(
+            'Failed to get bounds: Object has no geometry data or children with geometry data.')
+
+    bbmin, bbmax = bounds
+    return Vector(bbmin - margin), Vector(bbmax + margin)
+
+
+def get_total_bounds_array(obj, world=True, bounds_cache=None):
+    """Get the (min, max) arrays of the bound_box corners of obj and its mesh descendants, or None if there are no
+    meshes. bounds_cache is a dict keeping the result for every object in the hierarchy, to share between calls."""
+    if bounds_cache is None:
+        bounds_cache = {}
+    key = (obj.name, world)
+    if key in bounds_cache:
+        return bounds_cache[key]
+
+    mins = []
+    maxs = []
+    if obj.type == "MESH":
+        matrix = np.array(obj.matrix_world if world else obj.matrix_basis)
+        corners = np.array(obj.bound_box) @ matrix[:3, :3].T + matrix[:3, 3]
+        mins.append(corners.min(axis=0))
+        maxs.append(corners.max(axis=0))
+
+    for child in obj.children:
+        bounds = get_total_bounds_array(child, world, bounds_cache)
+        if bounds is not None:
+            mins.append(bounds[0])
+            maxs.append(bounds[1])
+
+    bounds = (np.min(mins, axis=0), np.max(maxs, axis=0)) if mins else None
+    bounds_cache[key] = bounds
+    return bounds
 
 
 def get_total_bounds(obj, world=True):
@@ -277,8 +356,8 @@ def get_total_bounds(obj, world=True):
     return corners
 
 
-def get_bound_center(obj, world=True):
-    bbmin, bbmax = get_bound_extents(obj, world)
+def get_bound_center(obj, world=True, bounds_cache=None):
+    bbmin, bbmax = get_bound_extents(obj, world, bounds_cache=bounds_cache)
     center = (bbmin + bbmax) / 2
 
     return center
@@ -308,8 +387,8 @@ def get_children_recursive(obj):
 """Get the radius of an object's bounding box"""
 
 
-def get_obj_radius(obj, world=True):
-    bb_min, bb_max = get_bound_extents(obj, world)
+def get_obj_radius(obj, world=True, bounds_cache=None):
+    bb_min, bb_max = get_bound_extents(obj, world, bounds_cache=bounds_cache)
 
     p1 = Vector((bb_min.x, bb_min.y, 0))
     p2 = Vector((bb_max.x, bb_max.y, 0))
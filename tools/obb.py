@@ -15,37 +15,11 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-import bpy
 import bmesh
-import math
-import time
 from mathutils import Vector, Matrix
 import numpy as np
 
 
-def bbox_orient(bme_verts, mx):
-    '''
-    takes a lsit of BMverts ora  list of vectors
-    '''
-    if hasattr(bme_verts[0], 'co'):
-        verts = [mx @ v.co for v in bme_verts]
-    else:
-        verts = [mx @ v for v in bme_verts]
-
-    xs = [v[0] for v in verts]
-    ys = [v[1] for v in verts]
-    zs = [v[2] for v in verts]
-
-    return (min(xs), max(xs), min(ys), max(ys), min(zs), max(zs))
-
-
-def bbox_vol(box):
-
-    V = (box[1]-box[0]) * (box[3]-box[2]) * (box[5]-box[4])
-
-    return V
-
-
 def box_coords(box):
     '''
     returns vertices in same configuration as default cube in blender
@@ -69,25 +43,196 @@ def get_obb_extents(obb):
     return Vector(np_obb.min(axis=0)), Vector(np_obb.max(axis=0))
 
 
-def get_obb(verts):
-    start = time.time()
-    # rand_sample = 400  #randomly select this many directions on a solid hemisphere to measure from
-    # spin_res = 180   #180 steps is 0.5 degrees
+def get_unique_directions(directions):
+    """Get the unit length directions, without zero length ones and ones parallel to an earlier direction"""
+    directions = np.asarray(directions, dtype=np.float64).reshape(-1, 3)
+    lengths = np.linalg.norm(directions, axis=1)
+    directions = directions[lengths > 1e-9] / \
+        lengths[lengths > 1e-9, np.newaxis]
+    # Point all directions to the same side of the plane of the largest component
+    largest = np.abs(directions).argmax(axis=1)
+    directions *= np.sign(directions[np.arange(len(directions)),
+                          largest])[:, np.newaxis]
+    _, first_indices = np.unique(
+        np.round(directions, 6), axis=0, return_index=True)
+    return directions[np.sort(first_indices)]
+
+
+def get_pca_rotation(points):
+    """Get the rotation whose rows are the principal axes of points"""
+    _, eigenvectors = np.linalg.eigh(np.cov(points, rowvar=False))
+    rotation = eigenvectors.T[::-1].copy()
+    if np.linalg.det(rotation) < 0:
+        rotation[2] *= -1
+    return rotation
+
+
+def get_plane_bases(normals):
+    """Get two unit axes perpendicular to each normal, such that the rows axis1, axis2, normal are right handed"""
+    # Cross with the world axis most perpendicular to the normal
+    helpers = np.identity(3)[np.abs(normals).argmin(axis=1)]
+    axes1 = np.cross(normals, helpers)
+    axes1 /= np.linalg.norm(axes1, axis=1)[:, np.newaxis]
+    return axes1, np.cross(normals, axes1)
+
+
+def convex_hull_2d(points):
+    """Get the convex hull of 2D points as a counter-clockwise list of points, without collinear ones"""
+    points = sorted(set(points))
+    if len(points) < 3:
+        return points
+
+    def half_hull(points):
+        hull = []
+        for p in points:
+            while len(hull) > 1 and ((hull[-1][0] - hull[-2][0]) * (p[1] - hull[-2][1]) -
+                                     (hull[-1][1] - hull[-2][1]) * (p[0] - hull[-2][0])) <= 0:
+                hull.pop()
+            hull.append(p)
+        return hull[:-1]
+
+    return half_hull(points) + half_hull(reversed(points))
+
+
+def get_outer_points(xs, ys):
+    """
+    Get a mask of the 2D points of each row of xs and ys that are not strictly inside the octagon through their
+    extreme points along the axes and diagonals. Only these can be on the convex hull.
+    """
+    rows = np.arange(len(xs))[:, np.newaxis]
+    # Counter-clockwise by direction: +x, +x+y, +y, -x+y, -x, -x-y, -y, +x-y
+    extremes = np.stack((xs.argmax(axis=1), (xs + ys).argmax(axis=1), ys.argmax(axis=1), (ys - xs).argmax(axis=1),
+                         xs.argmin(axis=1), (xs + ys).argmin(axis=1), ys.argmin(axis=1), (xs - ys).argmax(axis=1)),
+                        axis=1)
+    corner_xs = xs[rows, extremes]
+    corner_ys = ys[rows, extremes]
+    edge_xs = np.roll(corner_xs, -1, axis=1) - corner_xs
+    edge_ys = np.roll(corner_ys, -1, axis=1) - corner_ys
+
+    inside = np.ones(xs.shape, dtype=bool)
+    for i in range(extremes.shape[1]):
+        inside &= (edge_xs[:, i, np.newaxis] * (ys - corner_ys[:, i, np.newaxis]) -
+                   edge_ys[:, i, np.newaxis] * (xs - corner_xs[:, i, np.newaxis])) > 0
+    return ~inside
+
+
+def get_min_area_direction(hull):
+    """
+    Get the unit direction of the side of the minimum area rectangle around the counter-clockwise convex polygon
+    hull with rotating calipers. One side of that rectangle is along an edge of the polygon, and while walking
+    the edges, the points farthest along the edge, away from it and against it only ever move forward.
+    """
+    n = len(hull)
+    if n < 3:
+        if n < 2:
+            return None
+        (x0, y0), (x1, y1) = hull
+        length = ((x1 - x0) ** 2 + (y1 - y0) ** 2) ** 0.5
+        return (x1 - x0) / length, (y1 - y0) / length
+
+    best_area = None
+    best_direction = None
+    right = top = left = 0
+    for i in range(n):
+        x0, y0 = hull[i]
+        x1, y1 = hull[(i + 1) % n]
+        length = ((x1 - x0) ** 2 + (y1 - y0) ** 2) ** 0.5
+        dx, dy = (x1 - x0) / length, (y1 - y0) / length
+
+        def along(j):
+            return hull[j][0] * dx + hull[j][1] * dy
+
+        def away(j):
+            return hull[j][1] * dx - hull[j][0] * dy
+
+        if i == 0:
+            right = 1
+        while along((right + 1) % n) > along(right):
+            right = (right + 1) % n
+        if i == 0:
+            top = right
+        while away((top + 1) % n) > away(top):
+            top = (top + 1) % n
+        if i == 0:
+            left = top
+        while along((left + 1) % n) < along(left):
+            left = (left + 1) % n
+
+        width = along(right) - along(left)
+        height = away(top) - away(i)
+        if best_area is None or width * height < best_area:
+            best_area = width * height
+            best_direction = dx, dy
+
+    return best_direction
+
+
+def get_caliper_rotations(points, normals):
+    """
+    Get the rotation with each normal as third axis and, as first axis, the side of the minimum area rectangle
+    around points projected onto the plane of the normal. The rectangle is found with rotating calipers around
+    the 2D convex hull of the projected points.
+    """
+    axes1, axes2 = get_plane_bases(normals)
+    coords1 = (points @ axes1.T).T
+    coords2 = (points @ axes2.T).T
+    outer = get_outer_points(coords1, coords2)
+
+    rotations = []
+    for normal, axis1, axis2, xs, ys, mask in zip(normals, axes1, axes2, coords1, coords2, outer):
+        direction = get_min_area_direction(
+            convex_hull_2d(zip(xs[mask].tolist(), ys[mask].tolist())))
+        if direction is None:
+            continue
+        u = direction[0] * axis1 + direction[1] * axis2
+        # Rows u, n x u, n are a right handed basis
+        rotations.append((u, np.cross(normal, u), normal))
+    return np.array(rotations, dtype=np.float64).reshape(-1, 3, 3)
+
+
+def get_min_volume_box(points, rotations, best=None):
+    """
+    Get the (volume, rotation, min, max) of the smallest box around points in the frame of one of rotations,
+    an array of 3x3 matrices whose rows are the box axes. best is the result to beat, if any.
+    """
+    projected = np.einsum("rac,pc->rap", rotations, points)
+    bbmin = projected.min(axis=2)
+    bbmax = projected.max(axis=2)
+    volumes = np.prod(bbmax - bbmin, axis=1)
+    i = np.argmin(volumes)
+    if best is None or volumes[i] < best[0]:
+        return volumes[i], rotations[i], bbmin[i], bbmax[i]
+    return best
+
+
+def fit_obb(points, normals, chunk_size=1 << 21):
+    """
+    Find the oriented box of smallest volume around points among the axis aligned box, the box along the
+    principal axes and the boxes with a face along one of normals, rotated by rotating calipers around it. The
+    normals are the hull face normals of points.
+    Returns (rotation, min, max), where rotation is a 3x3 matrix whose rows are the box axes.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    pca_rotation = get_pca_rotation(points)
+    # The principal axes are also tried as face normals, for flat or degenerate hulls
+    normals = get_unique_directions(np.concatenate((normals, pca_rotation)))
+
+    best = get_min_volume_box(
+        points, np.stack((np.identity(3), pca_rotation)))
+
+    rotations = get_caliper_rotations(points, normals)
+    # Evaluate the candidates a few at a time to bound memory use
+    rotations_per_chunk = max(1, chunk_size // len(points))
+    for start in range(0, len(rotations), rotations_per_chunk):
+        best = get_min_volume_box(
+            points, rotations[start:start + rotations_per_chunk], best)
+
+    _, rotation, bbmin, bbmax = best
+    return rotation, bbmin, bbmax
 
-    world_mx = Matrix.Identity(4)
-    scale = world_mx.to_scale()
-    trans = world_mx.to_translation()
 
-    tr_mx = Matrix.Identity(4)
-    sc_mx = Matrix.Identity(4)
-
-    tr_mx[0][3], tr_mx[1][3], tr_mx[2][3] = trans[0], trans[1], trans[2]
-    sc_mx[0][0], sc_mx[1][1], sc_mx[2][2] = scale[0], scale[1], scale[2]
-    r_mx = world_mx.to_quaternion().to_matrix().to_4x4()
-
-    mesh = bpy.data.meshes.new('obb')
+def get_obb(verts):
     bme = bmesh.new()
-    bme.from_mesh(mesh)
 
     for vert in verts:
         bme.verts.new(vert)
@@ -96,40 +241,26 @@ def get_obb(verts):
         bme, input=bme.verts, use_existing_faces=True)
     total_hull = convex_hull['geom']
 
-    hull_verts = [item for item in total_hull if hasattr(item, 'co')]
-
-    min_mx = Matrix.Identity(4)
-    min_box = bbox_orient(hull_verts, min_mx)
-    min_axis = Vector((0, 0, 1))
-    min_V = bbox_vol(min_box)
-    axes = []
-    # Iterate through all degrees to obtain a more predictable result
-    for i in range(0, 360):
-        theta = math.radians(i)
-        phi = (1 + 5 ** 0.5) / 2
-
-        x = math.cos(theta) * math.sin(phi)
-        y = math.sin(theta) * math.sin(phi)
-        z = math.cos(phi)
-
-        axis = Vector((x, y, z))
-        axes.append(axis)
-        for n in range(0, 40):
-            angle = math.pi/2 * n/40
-            rot_mx = Matrix.Rotation(angle, 4, axis)
-
-            box = bbox_orient(hull_verts, rot_mx)
-            test_V = bbox_vol(box)
-
-            if test_V < min_V:
-                min_V = test_V
-                min_box = box
-                min_axis = axis
-                min_mx = rot_mx
-    elapsed_time = time.time() - start
+    hull_verts = [item for item in total_hull if isinstance(
+        item, bmesh.types.BMVert)]
+    # Flat selections may not give a hull
+    if len(hull_verts) < 3:
+        hull_verts = bme.verts
+
+    points = np.array([v.co for v in hull_verts], dtype=np.float64)
+    normals = []
+    for face in total_hull:
+        if isinstance(face, bmesh.types.BMFace):
+            a, b, c = (v.co for v in face.verts[:3])
+            normals.append((b - a).cross(c - a))
+
+    rotation, bbmin, bbmax = fit_obb(
+        points, np.array(normals, dtype=np.float64).reshape(-1, 3))
     bme.free()
-    fmx = tr_mx @ r_mx @ min_mx.inverted_safe() @ sc_mx
 
+    min_box = (bbmin[0], bbmax[0], bbmin[1], bbmax[1], bbmin[2], bbmax[2])
     box_verts = box_coords(min_box)
+    # The rotation is orthonormal, its transpose takes box coordinates to world coordinates
+    fmx = Matrix(rotation.T.tolist()).to_4x4()
 
     return box_verts, fmx
@@ -1,3 +1,4 @@
+import numpy as np
 from .properties import CollisionMatFlags
 from ..resources.bound import *
 from ..sollumz_properties import BOUND_SHAPE_TYPES, MaterialType, SollumType
@@ -126,6 +127,140 @@ def polygon_from_object(obj, geometry, verts_map, mat_map, export_settings):
         return bound
 
 
+"""Maximum number of polygons in a leaf of the BVH polygons are ordered by"""
+BVH_LEAF_SIZE = 4
+
+"""Sign of each axis for the 8 octants of a BoundGeometry, in the order they are stored"""
+OCTANT_DIRECTIONS = np.array([(1, 1, 1), (-1, 1, 1), (1, -1, 1), (-1, -1, 1),
+                              (1, 1, -1), (-1, 1, -1), (1, -1, -1), (-1, -1, -1)], dtype=np.float64)
+
+
+def get_polygon_bounds(polygons, vertices):
+    """Get the (min, max) arrays of the bounding boxes of polygons, which index into the vertex array vertices"""
+    indices = np.zeros((len(polygons), 4), dtype=np.int64)
+    radii = np.zeros(len(polygons), dtype=np.float64)
+    for i, poly in enumerate(polygons):
+        if type(poly) == Triangle:
+            indices[i] = poly.v1, poly.v2, poly.v3, poly.v3
+        elif type(poly) == Box:
+            indices[i] = poly.v1, poly.v2, poly.v3, poly.v4
+        elif type(poly) == Sphere:
+            indices[i] = poly.v
+            radii[i] = poly.radius
+        else:
+            indices[i] = poly.v1, poly.v2, poly.v2, poly.v2
+            radii[i] = poly.radius
+
+    corners = vertices[indices]
+    radii = radii[:, np.newaxis]
+    return corners.min(axis=1) - radii, corners.max(axis=1) + radii
+
+
+def build_polygon_bvh(bounds_min, bounds_max, leaf_size=BVH_LEAF_SIZE):
+    """Build a BVH over polygon bounding boxes by splitting each node at the median polygon centroid along the
+    longest axis of its centroid bounds. Returns the polygon order with the polygons of each leaf next to each
+    other, leaves in depth-first order. The BVH nodes themselves are not kept, as only the order is exported."""
+    centers = (bounds_min + bounds_max) * 0.5
+    order = np.arange(len(centers))
+
+    stack = [(0, len(order))]
+    while stack:
+        first, count = stack.pop()
+        if count <= leaf_size:
+            continue
+
+        items = order[first:first + count]
+        item_centers = centers[items]
+        axis = np.argmax(item_centers.max(axis=0) - item_centers.min(axis=0))
+        half = count // 2
+        order[first:first + count] = items[np.argpartition(
+            item_centers[:, axis], half, kind="introselect")]
+        # Push the right half first so leaves come out in depth-first order
+        stack.append((first + half, count - half))
+        stack.append((first, half))
+
+    return order
+
+
+def sort_polygons_spatially(geometry):
+    """Reorder the polygons of geometry so polygons close to each other are next to each other"""
+    if len(geometry.polygons) <= BVH_LEAF_SIZE:
+        return
+
+    vertices = np.array(geometry.vertices, dtype=np.float64).reshape(-1, 3)
+    order = build_polygon_bvh(
+        *get_polygon_bounds(geometry.polygons, vertices))
+    geometry.polygons = [geometry.polygons[i] for i in order]
+
+
+def get_octants(vertices):
+    """Get the vertex indices of each octant of a BoundGeometry: the vertices no other vertex is beyond on
+    all three axes in the direction of the octant"""
+    vertices = np.array(vertices, dtype=np.float64).reshape(-1, 3)
+    if len(vertices) == 0:
+        return [[] for _ in OCTANT_DIRECTIONS]
+
+    octants = []
+    for direction in OCTANT_DIRECTIONS:
+        points = vertices * direction
+        # A vertex can only be covered by one with a greater or equal coordinate sum, or equal sum and greater
+        # coordinates, so each vertex is only compared with the ones before it in this order. Of equal vertices,
+        # the first is kept.
+        order = np.lexsort(
+            (-points[:, 2], -points[:, 1], -points[:, 0], -points.sum(axis=1)))
+        points = points[order]
+        kept = []
+        kept_points = np.empty((0, 3))
+        start = 0
+        block_size = 16
+        while start < len(points):
+            block = np.arange(start, min(start + block_size, len(points)))
+            # Drop the vertices covered by the ones kept so far, then those covered within the block
+            block = block[~(points[block, np.newaxis, :] <= kept_points[np.newaxis, :, :]).all(
+                axis=2).any(axis=1)]
+            block_points = points[block]
+            block = block[~np.tril((block_points[:, np.newaxis, :] <= block_points[np.newaxis, :, :]).all(
+                axis=2), k=-1).any(axis=1)]
+            kept.append(order[block])
+            kept_points = np.concatenate((kept_points, points[block]))
+            start += block_size
+            block_size = min(block_size * 2, 4096)
+        octants.append(np.sort(np.concatenate(kept)).tolist())
+
+    return octants
+
+
+def get_polygon_loop_indices(mesh):
+    """Get the loop indices of every polygon of mesh, in polygon order"""
+    loop_starts = get_foreach_array(
+        mesh.polygons, "loop_start", dtype=np.int64).ravel()
+    loop_totals = get_foreach_array(
+        mesh.polygons, "loop_total", dtype=np.int64).ravel()
+    offsets = np.arange(loop_totals.sum()) - \
+        np.repeat(np.cumsum(loop_totals) - loop_totals, loop_totals)
+    return np.repeat(loop_starts, loop_totals) + offsets
+
+
+def get_triangle_vertices(child, mesh, geometry, export_settings):
+    """Get the position of each corner of every loop triangle of mesh, in geometry space, and the material slot
+    index of every triangle"""
+    positions = get_foreach_array(mesh.vertices, "co", 3).astype(np.float64)
+    if export_settings.use_transforms:
+        matrix = np.array(child.matrix_world)
+        positions = positions @ matrix[:3, :3].T + \
+            matrix[:3, 3] - np.array(geometry.geometry_center)
+    elif geometry.unk_type != 2:
+        matrix = np.array(child.matrix_basis)
+        positions = positions @ matrix[:3, :3].T + matrix[:3, 3]
+
+    loop_indices = get_foreach_array(
+        mesh.loop_triangles, "loops", 3, np.int32).ravel()
+    tri_materials = get_foreach_array(
+        mesh.loop_triangles, "material_index", dtype=np.int32).ravel()
+
+    return positions[get_loop_vertex_indices(mesh)[loop_indices]], tri_materials
+
+
 def geometry_from_object(obj, sollum_type=SollumType.BOUND_GEOMETRYBVH, export_settings=None, is_frag=False):
     geometry = None
 
@@ -158,7 +293,6 @@ def geometry_from_object(obj, sollum_type=SollumType.BOUND_GEOMETRYBVH, export_s
     # Get child poly bounds
     for child in get_children_recursive(obj):
         mesh = child.to_mesh()
-        mesh.calc_normals_split()
         mesh.calc_loop_triangles()
         if child.sollum_type == SollumType.BOUND_POLY_TRIANGLE:
             found = True
@@ -167,67 +301,47 @@ def geometry_from_object(obj, sollum_type=SollumType.BOUND_GEOMETRYBVH, export_s
             #     add_material(material, materials)
 
             # vert colors
-            for poly in mesh.polygons:
-                for loop_index in range(poly.loop_start, poly.loop_start + poly.loop_total):
-                    if(len(mesh.vertex_colors) > 0):
-                        geometry.vertex_colors.append(
-                            mesh.vertex_colors[0].data[loop_index].color)
-
-            for tri in mesh.loop_triangles:
+            if len(mesh.vertex_colors) > 0:
+                geometry.vertex_colors.extend(get_foreach_array(
+                    mesh.vertex_colors[0].data, "color", 4)[get_polygon_loop_indices(mesh)].tolist())
+
+            positions, tri_materials = get_triangle_vertices(
+                child, mesh, geometry, export_settings)
+            positions, corner_indices = weld_positions(positions)
+
+            # Add the welded vertices to the ones already used by the geometry
+            vert_indices = []
+            for vertex in map(tuple, positions.tolist()):
+                idx = vertices.get(vertex)
+                if idx is None:
+                    idx = len(vertices)
+                    vertices[vertex] = idx
+                    geometry.vertices.append(Vector(vertex))
+                vert_indices.append(idx)
+            corner_indices = np.array(vert_indices, dtype=np.int64)[
+                corner_indices].reshape(-1, 3)
+
+            # Add materials in the order the triangles first use them
+            mat_indices = {}
+            used_materials, first_uses = np.unique(
+                tri_materials, return_index=True)
+            for slot_index in used_materials[np.argsort(first_uses)].tolist():
+                mat_indices[slot_index] = add_material(
+                    child.data.materials[slot_index], mat_map, geometry.materials)
+
+            for (v1, v2, v3), slot_index in zip(corner_indices.tolist(), tri_materials.tolist()):
                 triangle = Triangle()
-                mat = child.data.materials[tri.material_index]
-                triangle.material_index = add_material(
-                    mat, mat_map, geometry.materials)
-
-                vert_indices = []
-                for loop_idx in tri.loops:
-                    loop = mesh.loops[loop_idx]
-
-                    vertex = mesh.vertices[loop.vertex_index].co
-                    if export_settings.use_transforms:
-                        vertex = (child.matrix_world @ vertex) - \
-                            geometry.geometry_center
-                    else:
-                        if geometry.unk_type != 2:
-                            vertex = child.matrix_basis @ vertex
-
-                    # Must be tuple for dedupe to work
-                    vertex = tuple(vertex)
-
-                    if vertex in vertices:
-                        idx = vertices[vertex]
-                    else:
-                        idx = len(vertices)
-                        vertices[vertex] = len(vertices)
-                        geometry.vertices.append(Vector(vertex))
-
-                    vert_indices.append(idx)
-
-                triangle.v1 = vert_indices[0]
-                triangle.v2 = vert_indices[1]
-                triangle.v3 = vert_indices[2]
+                triangle.material_index = mat_indices[slot_index]
+                triangle.v1 = v1
+                triangle.v2 = v2
+                triangle.v3 = v3
                 geometry.polygons.append(triangle)
         elif child.sollum_type == SollumType.BOUND_POLY_TRIANGLE2:
-            vertices2 = {}
-            for tri in mesh.loop_triangles:
-                for loop_idx in tri.loops:
-                    loop = mesh.loops[loop_idx]
-                    vertex = mesh.vertices[loop.vertex_index].co
-                    if export_settings.use_transforms:
-                        vertex = (child.matrix_world @ vertex) - \
-                            geometry.geometry_center
-                    else:
-                        if geometry.unk_type != 2:
-                            vertex = child.matrix_basis @ vertex
-
-                    # Must be tuple for dedupe to work
-                    vertex = tuple(vertex)
-
-                    if vertex in vertices2:
-                        idx = vertices2[vertex]
-                    else:
-                        vertices2[vertex] = len(vertices2)
-                        geometry.vertices_2.append(Vector(vertex))
+            positions, _ = get_triangle_vertices(
+                child, mesh, geometry, export_settings)
+            positions, _ = weld_positions(positions)
+            geometry.vertices_2.extend(Vector(vertex)
+                                       for vertex in positions.tolist())
         else:
             poly = polygon_from_object(
                 child, geometry, vertices, mat_map, export_settings)
@@ -245,6 +359,9 @@ def geometry_from_object(obj, sollum_type=SollumType.BOUND_GEOMETRYBVH, export_s
     if type(geometry) is BoundGeometry:
         if len(geometry.vertices_2) == 0:
             geometry.vertices_2 = geometry.vertices
+        geometry.octants = get_octants(geometry.vertices)
+    else:
+        sort_polygons_spatially(geometry)
 
     return geometry
 
@@ -1,4 +1,5 @@
 import bpy
+import numpy as np
 from .properties import CollisionMatFlags
 from ..resources.bound import *
 from ..sollumz_properties import *
@@ -149,22 +150,49 @@ def poly_to_obj(poly, materials, vertices):
         return cylinder
 
 
-def mat_to_obj(gmat):
-    mat = create_collision_material_from_index(gmat.type)
-    mat.sollum_type = MaterialType.COLLISION
-    mat.collision_properties.procedural_id = gmat.procedural_id
-    mat.collision_properties.room_id = gmat.room_id
-    mat.collision_properties.ped_density = gmat.ped_density
-    mat.collision_properties.material_color_index = gmat.material_color_index
+"""Collision materials created on import, by (collision index, procedural id, room id, ped density, flags,
+colour index)"""
+_collision_material_cache = {}
+
+
+def get_collision_material_key(mat):
+    props = mat.collision_properties
+    flags = frozenset(flag_name for flag_name in CollisionMatFlags.__annotations__.keys()
+                      if getattr(mat.collision_flags, flag_name))
+    return (props.collision_index, props.procedural_id, props.room_id, props.ped_density, flags,
+            props.material_color_index)
 
-    # Assign flags
-    for flag_name in CollisionMatFlags.__annotations__.keys():
-        if f"FLAG_{flag_name.upper()}" in gmat.flags:
-            setattr(mat.collision_flags, flag_name, True)
 
+def get_collision_material(collision_index, procedural_id=0, room_id=0, ped_density=0, flags=frozenset(), material_color_index=0):
+    """Get a collision material with the given properties. The material created for the same properties by an
+    earlier call is reused, unless it was removed or changed since."""
+    key = (collision_index, procedural_id, room_id,
+           ped_density, frozenset(flags), material_color_index)
+    mat = bpy.data.materials.get(_collision_material_cache.get(key, ""))
+    if mat is not None and mat.sollum_type == MaterialType.COLLISION and get_collision_material_key(mat) == key:
+        return mat
+
+    mat = create_collision_material_from_index(collision_index)
+    mat.collision_properties.procedural_id = procedural_id
+    mat.collision_properties.room_id = room_id
+    mat.collision_properties.ped_density = ped_density
+    mat.collision_properties.material_color_index = material_color_index
+    for flag_name in flags:
+        setattr(mat.collision_flags, flag_name, True)
+
+    _collision_material_cache[key] = mat.name
     return mat
 
 
+def mat_to_obj(gmat):
+    # Assign flags
+    flags = [flag_name for flag_name in CollisionMatFlags.__annotations__.keys()
+             if f"FLAG_{flag_name.upper()}" in gmat.flags]
+
+    return get_collision_material(gmat.type, gmat.procedural_id, gmat.room_id, gmat.ped_density, flags,
+                                  gmat.material_color_index)
+
+
 def verts_to_obj(vertices, polys, materials, parent, vertex_colors=None):
     if vertices:
         if len(vertices) == 0:
@@ -178,34 +206,13 @@ def verts_to_obj(vertices, polys, materials, parent, vertex_colors=None):
         SOLLUMZ_UI_NAMES[SollumType.BOUND_POLY_TRIANGLE], mesh)
     obj.sollum_type = SollumType.BOUND_POLY_TRIANGLE
 
-    verts = []
-    faces = []
-    tri_materials = []
+    # Weld the corners of the triangles by position
+    corners = np.array([(poly.v1, poly.v2, poly.v3)
+                       for poly in polys], dtype=np.int64).reshape(-1, 3)
+    verts, faces = weld_positions(
+        np.array(vertices, dtype=np.float32)[corners.ravel()])
 
-    for poly in polys:
-        face = []
-        v1 = vertices[poly.v1]
-        v2 = vertices[poly.v2]
-        v3 = vertices[poly.v3]
-        if not v1 in verts:
-            verts.append(v1)
-            face.append(len(verts) - 1)
-        else:
-            face.append(verts.index(v1))
-        if not v2 in verts:
-            verts.append(v2)
-            face.append(len(verts) - 1)
-        else:
-            face.append(verts.index(v2))
-        if not v3 in verts:
-            verts.append(v3)
-            face.append(len(verts) - 1)
-        else:
-            face.append(verts.index(v3))
-        faces.append(face)
-        tri_materials.append(poly.material_index)
-
-    obj.data.from_pydata(verts, [], faces)
+    create_triangle_mesh(mesh, verts, faces)
     bpy.context.collection.objects.link(obj)
     obj.parent = parent
 
@@ -217,9 +224,8 @@ def verts_to_obj(vertices, polys, materials, parent, vertex_colors=None):
     for mat in materials:
         obj.data.materials.append(mat)
 
-    for index, poly in obj.data.polygons.items():
-        if tri_materials[index]:
-            poly.material_index = tri_materials[index]
+    mesh.polygons.foreach_set("material_index", np.array(
+        [poly.material_index or 0 for poly in polys], dtype=np.int32))
 
     return obj
 
@@ -286,7 +292,7 @@ def init_bound_obj(bound, sollum_type):
         obj = bpy.data.objects.new(name, mesh)
         mat_index = bound.material_index
         try:
-            mat = create_collision_material_from_index(mat_index)
+            mat = get_collision_material(mat_index)
             mesh.materials.append(mat)
         except IndexError:
             print(
@@ -378,7 +384,8 @@ def composite_to_obj(bounds, name, from_drawable=False):
     return obj
 
 
-def import_ybn(filepath):
-    ybn_xml = YBN.from_xml_file(filepath)
+def import_ybn(filepath, ybn_xml=None):
+    if ybn_xml is None:
+        ybn_xml = YBN.from_xml_file(filepath)
     composite_to_obj(ybn_xml, os.path.basename(
         filepath.replace(YBN.file_extension, '')))
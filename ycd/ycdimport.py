@@ -386,7 +386,7 @@ def clip_dictionary_to_obj(clip_dictionary, name, armature, armature_obj):
         clip_obj.parent = clips_obj
 
 
-def import_ycd(export_op, filepath, import_settings):
+def import_ycd(export_op, filepath, import_settings, ycd_xml=None):
     if import_settings.selected_armature == -1 or not list_index_exists(bpy.data.armatures, import_settings.selected_armature):
         export_op.warning('Selected target skeleton not found.')
         return
@@ -394,7 +394,7 @@ def import_ycd(export_op, filepath, import_settings):
     armature = bpy.data.armatures[import_settings.selected_armature]
     armature_obj = get_armature_obj(armature)
 
-    ycr_xml = YCD.from_xml_file(filepath)
+    ycr_xml = ycd_xml if ycd_xml is not None else YCD.from_xml_file(filepath)
 
     clip_dictionary_to_obj(
         ycr_xml,
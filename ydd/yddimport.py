@@ -55,8 +55,9 @@ def drawable_dict_to_obj(drawable_dict, filepath, import_settings):
     return dict_obj
 
 
-def import_ydd(export_op, filepath, import_settings):
-    ydd_xml = YDD.from_xml_file(filepath)
+def import_ydd(export_op, filepath, import_settings, ydd_xml=None):
+    if ydd_xml is None:
+        ydd_xml = YDD.from_xml_file(filepath)
 
     if import_settings.import_ext_skeleton:
         skel_filepath = find_fragment_file(filepath)
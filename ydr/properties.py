@@ -203,11 +203,8 @@ class LightFlags(FlagPropertyGroup, bpy.types.PropertyGroup):
     unk32: bpy.props.BoolProperty(
         name="Unk32", update=FlagPropertyGroup.update_flag)
 
-# Handler sets the default value of the ShaderMaterials collection on blend file load
-
-
-@persistent
-def on_file_loaded(_):
+def load_shader_materials():
+    """Fill the ShaderMaterials collection, this loads the shaders"""
     bpy.context.scene.shader_materials.clear()
     for index, mat in enumerate(shadermats):
         item = bpy.context.scene.shader_materials.add()
@@ -215,6 +212,19 @@ def on_file_loaded(_):
         item.name = mat.name
 
 
+def request_shader_materials():
+    """Fill the ShaderMaterials collection once drawing is done, ID data can't be written while drawing"""
+    if not bpy.app.timers.is_registered(load_shader_materials):
+        bpy.app.timers.register(load_shader_materials)
+
+
+# Handler empties the ShaderMaterials collection on blend file load, it is filled again when the shader list is
+# first drawn so loading a file doesn't load the shaders
+@persistent
+def on_file_loaded(_):
+    bpy.context.scene.shader_materials.clear()
+
+
 def get_light_type(self):
     if self.type == 'POINT':
         return 1 if not self.is_capsule else 3
@@ -4,14 +4,32 @@ from ..tools.version import USE_LEGACY
 from ..resources.shader import ShaderManager
 from ..sollumz_properties import MaterialType
 from collections import namedtuple
+from collections.abc import Sequence
 
 ShaderMaterial = namedtuple("ShaderMaterial", "name, ui_name, value")
 
-shadermats = []
 
-for shader in ShaderManager.shaders.values():
-    shadermats.append(ShaderMaterial(
-        shader.name.upper(), shader.name.upper().replace('_', ' '), shader.name))
+class ShaderMaterialList(Sequence):
+    """ShaderMaterial of every shader, listed the first time it's used so the shaders aren't loaded on import"""
+
+    def __init__(self):
+        self._items = None
+
+    @property
+    def items(self):
+        if self._items is None:
+            self._items = [ShaderMaterial(shader.name.upper(), shader.name.upper().replace('_', ' '), shader.name)
+                           for shader in ShaderManager.shaders.values()]
+        return self._items
+
+    def __getitem__(self, index):
+        return self.items[index]
+
+    def __len__(self):
+        return len(self.items)
+
+
+shadermats = ShaderMaterialList()
 
 
 def try_get_node(node_tree, name):
@@ -775,14 +793,13 @@ def create_terrain_shader(mat, shader, filename):
     link_value_shader_parameters(shader, node_tree)
 
 
-def create_shader(name, filename=None):
-    if not name in ShaderManager.shaders:
-        raise AttributeError(f"Shader '{name}' does not exist!")
+"""Names of the template materials copied by create_shader, keyed by shader name and filename"""
+shader_templates = {}
 
-    shader = ShaderManager.shaders[name]
-    filename = filename if filename else shader.filenames[0].value
 
-    mat = bpy.data.materials.new(name)
+def create_shader_template(shader, filename):
+    # Templates are hidden from material lists and, having no users, aren't saved with the blend file
+    mat = bpy.data.materials.new(f".template.{shader.name}.{filename}")
     mat.sollum_type = MaterialType.SHADER
     mat.use_nodes = True
     mat.shader_properties.name = shader.name
@@ -797,3 +814,23 @@ def create_shader(name, filename=None):
     organize_node_tree(mat.node_tree)
 
     return mat
+
+
+def create_shader(name, filename=None):
+    if not name in ShaderManager.shaders:
+        raise AttributeError(f"Shader '{name}' does not exist!")
+
+    shader = ShaderManager.shaders[name]
+    filename = filename if filename else shader.filenames[0].value
+
+    # The node tree is built once per shader and filename, later materials are copies of it
+    template = bpy.data.materials.get(
+        shader_templates.get((name, filename), ""))
+    if template is None:
+        template = create_shader_template(shader, filename)
+        shader_templates[(name, filename)] = template.name
+
+    mat = template.copy()
+    mat.name = name
+
+    return mat
@@ -1,7 +1,7 @@
 import bpy
 from .shader_materials import *
 from .operators import *
-from .properties import LightFlags
+from .properties import LightFlags, request_shader_materials
 from ..sollumz_ui import SOLLUMZ_PT_OBJECT_PANEL, SOLLUMZ_PT_MAT_PANEL
 from ..sollumz_properties import SollumType, TimeFlags
 from ..sollumz_ui import FlagsPanel, TimeFlagsPanel
@@ -175,6 +175,8 @@ class SOLLUMZ_PT_CREATE_SHADER_PANEL(bpy.types.Panel):
 
     def draw(self, context):
         layout = self.layout
+        if not context.scene.shader_materials:
+            request_shader_materials()
         layout.template_list(
             SOLLUMZ_UL_SHADER_MATERIALS_LIST.bl_idname, "", context.scene, "shader_materials", context.scene, "shader_material_index"
         )
@@ -4,6 +4,7 @@ import collections
 import bmesh
 import bpy
 import zlib
+import numpy as np
 from ..resources.fragment import FragmentDrawable
 from ..resources.drawable import *
 from ..resources.shader import ShaderManager
@@ -153,137 +154,134 @@ def get_blended_verts(mesh, vertex_groups, bones=None):
         for i in range(256):
             bone_index_map[f"UNKNOWN_BONE.{i}"] = i
 
-    blend_weights = []
-    blend_indices = []
+    # Bone index of every vertex group, -1 for locked groups and groups without a bone
+    group_bone_indices = np.full(len(vertex_groups) + 1, -1, dtype=np.int64)
+    for i, vertex_group in enumerate(vertex_groups):
+        vg_name = vertex_group.name if bones else vertex_group.name[:-4]
+        if vertex_group.lock_weight == False:
+            group_bone_indices[i] = bone_index_map.get(vg_name, -1)
+
+    # Every group membership as (vertex, group, weight), in vertex then membership order
+    num_vertices = len(mesh.vertices)
+    element_vertices = []
+    element_groups = []
+    element_weights = []
     for v in mesh.vertices:
-        if len(v.groups) > 0:
-            bw = [0] * 4
-            bi = [0] * 4
-            valid_weights = 0
-            total_weights = 0
-            max_weights = 0
-            max_weights_index = -1
-
-            for element in v.groups:
-                if element.group >= len(vertex_groups):
-                    continue
-
-                vertex_group = vertex_groups[element.group]
-                vg_name = vertex_group.name if bones else vertex_group.name[:-4]
-                bone_index = bone_index_map.get(vg_name, -1)
-                # 1/255 = 0.0039 the minimal weight for one vertex group
-                weight = round(element.weight * 255)
-                if (vertex_group.lock_weight == False and bone_index != -1 and weight > 0 and valid_weights < 4):
-                    bw[valid_weights] = weight
-                    bi[valid_weights] = bone_index
-                    if (max_weights < weight):
-                        max_weights_index = valid_weights
-                        max_weights = weight
-                    valid_weights += 1
-                    total_weights += weight
-
-            # weights normalization
-            if valid_weights > 0 and max_weights_index != -1:
-                bw[max_weights_index] = bw[max_weights_index] + \
-                    (255 - total_weights)
-
-            f = ((x, y) for x, y in zip(bw, bi))
-            sorted_f = sorted(f, key=lambda x: x[0])
-            bi = [i[1] for i in sorted_f]
-            bw.sort()
-
-            bw.append(bw.pop(0))
-            bi.append(bi.pop(0))
-
-            blend_weights.append(bw)
-            blend_indices.append(bi)
-        else:
-            blend_weights.append([0, 0, 0, 0])
-            blend_indices.append([0, 0, 0, 0])
-
-    return blend_weights, blend_indices
-
-
-def get_mesh_buffers(obj, mesh, vertex_type, bones=None, export_settings=None):
+        for element in v.groups:
+            element_vertices.append(v.index)
+            element_groups.append(element.group)
+            element_weights.append(element.weight)
+
+    element_vertices = np.array(element_vertices, dtype=np.int64)
+    element_groups = np.array(element_groups, dtype=np.int64)
+    # Memberships of groups that don't exist map to the trailing -1
+    element_groups[element_groups >= len(vertex_groups)] = len(vertex_groups)
+    element_bones = group_bone_indices[element_groups]
+    # 1/255 = 0.0039 the minimal weight for one vertex group
+    element_weights = np.round(
+        np.array(element_weights, dtype=np.float64) * 255).astype(np.int64)
+
+    # Keep the first 4 valid memberships of each vertex
+    valid = (element_bones != -1) & (element_weights > 0)
+    valid_count = np.cumsum(valid)
+    vertex_starts = np.searchsorted(element_vertices, element_vertices)
+    slots = valid_count - 1 - \
+        np.concatenate(([0], valid_count))[vertex_starts]
+    valid &= slots < 4
+
+    bw = np.zeros((num_vertices, 4), dtype=np.int64)
+    bi = np.zeros((num_vertices, 4), dtype=np.int64)
+    bw[element_vertices[valid], slots[valid]] = element_weights[valid]
+    bi[element_vertices[valid], slots[valid]] = element_bones[valid]
+
+    # weights normalization, the residual goes to the first largest weight
+    weighted = np.any(bw > 0, axis=1)
+    rows = np.flatnonzero(weighted)
+    bw[rows, np.argmax(bw[rows], axis=1)] += 255 - bw[rows].sum(axis=1)
+
+    # Sort by weight and move the smallest to the end
+    order = np.argsort(bw, axis=1, kind="stable")
+    bw = np.roll(np.take_along_axis(bw, order, axis=1), -1, axis=1)
+    bi = np.roll(np.take_along_axis(bi, order, axis=1), -1, axis=1)
+
+    return bw, bi
+
+
+def get_mesh_buffers(obj, mesh, layout, bones=None, export_settings=None):
     # thanks dexy
-
-    blend_weights, blend_indices = get_blended_verts(
-        mesh, obj.vertex_groups, bones)
-
-    vertices = {}
-    indices = []
-
-    for tri in mesh.loop_triangles:
-        for loop_idx in tri.loops:
-            loop = mesh.loops[loop_idx]
-            vert_idx = loop.vertex_index
-            mesh_layer_idx = 0
-
-            kwargs = {}
-
-            if "position" in vertex_type._fields:
-                if mesh.vertices[vert_idx]:
-                    if export_settings.use_transforms:
-                        pos = float32_list(
-                            obj.matrix_world @ mesh.vertices[vert_idx].co)
-                    else:
-                        pos = float32_list(
-                            obj.matrix_basis @ mesh.vertices[vert_idx].co)
-                    kwargs['position'] = tuple(pos)
-                else:
-                    kwargs["position"] = tuple([0, 0, 0])
-            if "normal" in vertex_type._fields:
-                if loop.normal:
-                    normal = float32_list(loop.normal)
-                    kwargs["normal"] = tuple(normal)
-                else:
-                    kwargs["normal"] = tuple([0, 0, 0])
-            if "blendweights" in vertex_type._fields:
-                kwargs['blendweights'] = tuple(blend_weights[vert_idx])
-            if "blendindices" in vertex_type._fields:
-                kwargs['blendindices'] = tuple(blend_indices[vert_idx])
-            if "tangent" in vertex_type._fields:
-                if loop.tangent:
-                    tangent = float32_list(loop.tangent.to_4d())
-                    tangent[3] = loop.bitangent_sign  # convert to float 32 ?
-                    kwargs["tangent"] = tuple(tangent)
-                else:
-                    kwargs["tangent"] = tuple([0, 0, 0, 0])
-            for i in range(6):
-                if f"texcoord{i}" in vertex_type._fields:
-                    key = f'texcoord{i}'
-                    if mesh_layer_idx < len(mesh.uv_layers):
-                        data = mesh.uv_layers[mesh_layer_idx].data
-                        uv = float32_list(
-                            flip_uv(data[loop_idx].uv))
-                        kwargs[key] = tuple(uv)
-                        mesh_layer_idx += 1
-                    else:
-                        kwargs[key] = (0, 0)
-            for i in range(2):
-                if f"colour{i}" in vertex_type._fields:
-                    key = f'colour{i}'
-                    if i < len(mesh.vertex_colors):
-                        data = mesh.vertex_colors[i].data
-                        kwargs[key] = tuple(
-                            int(val * 255) for val in data[loop_idx].color)
-                    else:
-                        kwargs[key] = (0, 0, 0, 0)
-
-            vertex = vertex_type(**kwargs)
-
-            if vertex in vertices:
-                idx = vertices[vertex]
-            else:
-                idx = len(vertices)
-                vertices[vertex] = idx
-
-            indices.append(idx)
-
-    return vertices.keys(), indices
-
-
-def get_semantic_from_object(shader, mesh):
+    vertex_dtype = layout.vertex_dtype
+    fields = vertex_dtype.names
+
+    # One vertex per loop of every triangle, deduplicated below
+    loop_indices = get_foreach_array(
+        mesh.loop_triangles, "loops", 3, np.int32).ravel()
+    vertex_indices = get_loop_vertex_indices(mesh)[loop_indices]
+    vertices = np.zeros(len(loop_indices), dtype=vertex_dtype)
+
+    if "position" in fields:
+        positions = get_foreach_array(mesh.vertices, "co", 3)
+        if export_settings.use_transforms:
+            matrix = np.array(obj.matrix_world)
+        else:
+            matrix = np.array(obj.matrix_basis)
+        positions = positions @ matrix[:3, :3].T + matrix[:3, 3]
+        vertices["position"] = positions[vertex_indices]
+    if "normal" in fields:
+        vertices["normal"] = get_foreach_array(
+            mesh.loops, "normal", 3)[loop_indices]
+    if "blendweights" in fields or "blendindices" in fields:
+        blend_weights, blend_indices = get_blended_verts(
+            mesh, obj.vertex_groups, bones)
+        if "blendweights" in fields:
+            vertices["blendweights"] = blend_weights[vertex_indices]
+        if "blendindices" in fields:
+            vertices["blendindices"] = blend_indices[vertex_indices]
+    if "tangent" in fields:
+        tangents = np.empty((len(loop_indices), 4), dtype=np.float32)
+        tangents[:, :3] = get_foreach_array(
+            mesh.loops, "tangent", 3)[loop_indices]
+        tangents[:, 3] = get_foreach_array(
+            mesh.loops, "bitangent_sign").ravel()[loop_indices]
+        vertices["tangent"] = tangents
+
+    mesh_layer_idx = 0
+    for i in range(6):
+        key = f"texcoord{i}"
+        if key in fields and mesh_layer_idx < len(mesh.uv_layers):
+            uvs = get_foreach_array(
+                mesh.uv_layers[mesh_layer_idx].data, "uv", 2)[loop_indices]
+            # flip v
+            uvs[:, 1] = 1.0 - uvs[:, 1]
+            vertices[key] = uvs
+            mesh_layer_idx += 1
+    for i in range(2):
+        key = f"colour{i}"
+        if key in fields and i < len(mesh.vertex_colors):
+            colors = get_foreach_array(
+                mesh.vertex_colors[i].data, "color", 4)[loop_indices]
+            vertices[key] = (colors.astype(np.float64) * 255).astype(np.int64)
+
+    # Compare vertices by their bytes, with -0.0 and 0.0 treated as the same value
+    keys = vertices.copy()
+    for name in fields:
+        if vertex_dtype[name].base.kind == "f":
+            keys[name] += 0.0
+    keys = keys.view(np.dtype((np.void, vertex_dtype.itemsize)))
+    _, first_indices, inverse = np.unique(
+        keys, return_index=True, return_inverse=True)
+
+    # Number the unique vertices in order of first use
+    order = np.argsort(first_indices)
+    new_indices = np.empty(len(order), dtype=np.uint32)
+    new_indices[order] = np.arange(len(order), dtype=np.uint32)
+
+    vertex_buffer = vertices[first_indices[order]]
+    index_buffer = new_indices[inverse.ravel()]
+
+    return vertex_buffer, index_buffer
+
+
+def get_semantic_from_object(shader, mesh, vertex_groups=None):
 
     sematic = []
 
@@ -291,11 +289,13 @@ def get_semantic_from_object(shader, mesh):
     sematic.append(VertexSemantic.position)
     # add blend weights and blend indicies
     # maybe pass is_skinned param in this function and check there ?
+    # Vertices can only be in a group if the object has vertex groups
     is_skinned = False
-    for v in mesh.vertices:
-        if len(v.groups) > 0:
-            is_skinned = True
-            break
+    if vertex_groups is None or len(vertex_groups) > 0:
+        for v in mesh.vertices:
+            if len(v.groups) > 0:
+                is_skinned = True
+                break
     if is_skinned:
         sematic.append(VertexSemantic.blend_weight)
         sematic.append(VertexSemantic.blend_index)
@@ -377,11 +377,11 @@ def geometry_from_object(obj, mats, bones=None, export_settings=None):
         is_skinned = True
 
     layout = shader.get_layout_from_semantic(
-        get_semantic_from_object(shader, mesh), is_skinned=is_skinned)
+        get_semantic_from_object(shader, mesh, obj.vertex_groups), is_skinned=is_skinned)
 
     geometry.vertex_buffer.layout = layout.value
     vertex_buffer, index_buffer = get_mesh_buffers(
-        obj, mesh, layout.vertex_type, bones, export_settings)
+        obj, mesh, layout, bones, export_settings)
 
     geometry.vertex_buffer.data = vertex_buffer
     geometry.index_buffer.data = index_buffer
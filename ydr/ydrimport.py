@@ -2,23 +2,116 @@ from math import pi, radians
 import os
 import bpy
 from mathutils import Matrix
+import numpy as np
 from .shader_materials import create_shader, create_tinted_shader_graph, get_detail_extra_sampler
 from ..ybn.ybnimport import composite_to_obj, bound_to_obj
 from ..sollumz_properties import SOLLUMZ_UI_NAMES, LODLevel, TextureFormat, TextureUsage, SollumType, LightType
 from ..resources.drawable import *
-from ..tools.meshhelper import create_uv_layer, create_vertexcolor_layer
+from ..tools.meshhelper import create_triangle_mesh, create_uv_layer, create_vertexcolor_layer
 from ..tools.utils import *
 from ..tools.blenderhelper import *
 from .properties import LightFlags
 from ..tools.drawablehelper import join_drawable_geometries
 
 
+"""Index of the shared texture folder, kept between imports"""
+_shared_texture_index = {"folder": None, "dir_mtimes": {}, "paths": {}}
+
+
+def get_shared_texture_paths(shared_folder):
+    """Get a map of normcased texture file name -> path of the files in shared_folder and its subfolders.
+    The folder is only walked again when it changes or one of its directories was modified."""
+    index = _shared_texture_index
+    if index["folder"] == shared_folder:
+        try:
+            if all(os.stat(d).st_mtime_ns == mtime for d, mtime in index["dir_mtimes"].items()):
+                return index["paths"]
+        except OSError:
+            pass
+
+    dir_mtimes = {}
+    paths = {}
+    for dirpath, _, filenames in os.walk(shared_folder):
+        dir_mtimes[dirpath] = os.stat(dirpath).st_mtime_ns
+        # Later directories take precedence, like the search through every directory did
+        for filename in filenames:
+            paths[os.path.normcase(filename)] = os.path.join(
+                dirpath, filename)
+
+    index["folder"] = shared_folder
+    index["dir_mtimes"] = dir_mtimes
+    index["paths"] = paths
+    return paths
+
+
+"""Materials created during the current import session, by the content key of the shader they were created from"""
+_material_cache = {}
+
+
+def clear_material_cache():
+    """Start a new import session, materials are only reused within one session"""
+    _material_cache.clear()
+
+
+def get_texture_path(texture_name, texture_folder, shared_texture_paths):
+    """Get the path of the texture file to load for a texture parameter, or None if there is none"""
+    texture_path = os.path.join(texture_folder, texture_name + ".dds")
+    if os.path.isfile(texture_path):
+        return texture_path
+    # check shared texture folder
+    t_path = shared_texture_paths.get(os.path.normcase(texture_name + ".dds"))
+    if t_path and os.path.isfile(t_path):
+        return t_path
+    return None
+
+
+def get_shader_key(shader, texture_paths, texture_dictionary):
+    """Get a hashable key of everything that goes into the material created from a shader: its name, filename,
+    render bucket, parameters, the texture files they resolve to and their embedded texture properties"""
+    params = []
+    for param in shader.parameters:
+        if param.type == TextureShaderParameter.type:
+            embedded = tuple((texture.format, texture.usage, texture.extra_flags, tuple(texture.usage_flags))
+                             for texture in texture_dictionary or () if texture.name == param.texture_name)
+            params.append((param.name, param.texture_name,
+                          texture_paths.get(param.texture_name), embedded))
+        elif param.type == VectorShaderParameter.type:
+            params.append((param.name, param.x, param.y, param.z, param.w))
+        else:
+            params.append((param.name, tuple(tuple(value.value)
+                          for value in param.value)))
+
+    return (shader.name, shader.filename, shader.render_bucket, tuple(params))
+
+
 def shadergroup_to_materials(shadergroup, filepath):
+    """Create the materials of a shader group. Shaders identical to one already imported in this session reuse
+    its material"""
     materials = []
 
     texture_folder = os.path.dirname(
         filepath) + "\\" + os.path.basename(filepath)[:-8]
+    addon_key = __name__.split('.')[0]
+    shared_folder = bpy.context.preferences.addons[
+        addon_key].preferences.shared_texture_folder
+    shared_texture_paths = get_shared_texture_paths(shared_folder)
+    images = {image.name: image for image in bpy.data.images}
+
+    texture_paths = {}
     for shader in shadergroup.shaders:
+        for param in shader.parameters:
+            if param.type == TextureShaderParameter.type and param.texture_name and param.texture_name not in texture_paths:
+                texture_paths[param.texture_name] = get_texture_path(
+                    param.texture_name, texture_folder, shared_texture_paths)
+
+    for shader in shadergroup.shaders:
+        shader_key = get_shader_key(
+            shader, texture_paths, shadergroup.texture_dictionary)
+        material = bpy.data.materials.get(
+            _material_cache.get(shader_key, ""))
+        if material is not None:
+            materials.append(material)
+            continue
 
         material = create_shader(shader.name, shader.filename)
 
@@ -29,37 +122,21 @@ def shadergroup_to_materials(shadergroup, filepath):
             for n in material.node_tree.nodes:
                 if isinstance(n, bpy.types.ShaderNodeTexImage):
                     if param.name == n.name:
-                        texture_path = os.path.join(
-                            texture_folder, param.texture_name + ".dds")
-                        addon_key = __name__.split('.')[0]
-                        shared_folder = bpy.context.preferences.addons[
-                            addon_key].preferences.shared_texture_folder
-                        shared_folder_dirs = [x[0]
-                                              for x in os.walk(shared_folder)]
-                        if(os.path.isfile(texture_path)):
+                        texture_path = texture_paths.get(param.texture_name)
+                        if texture_path:
                             img = bpy.data.images.load(
                                 texture_path, check_existing=True)
                             n.image = img
-                        # check shared texture folder
-                        else:
-                            for d in shared_folder_dirs:
-                                t_path = os.path.join(
-                                    d, param.texture_name + ".dds")
-                                if(os.path.isfile(t_path)):
-                                    img = bpy.data.images.load(
-                                        t_path, check_existing=True)
-                                    n.image = img
                         if not n.image:
                             # for texture shader parameters with no name
                             if not param.texture_name:
                                 continue
                             # Check for existing texture
-                            existing_texture = None
-                            for image in bpy.data.images:
-                                if image.name == param.texture_name:
-                                    existing_texture = image
-                            texture = bpy.data.images.new(
-                                name=param.texture_name, width=512, height=512) if not existing_texture else existing_texture
+                            texture = images.get(param.texture_name)
+                            if texture is None:
+                                texture = bpy.data.images.new(
+                                    name=param.texture_name, width=512, height=512)
+                                images[texture.name] = texture
                             n.image = texture
                             # n.image = bpy.data.images.new(
                             #     name=param.texture_name, width=512, height=512)
@@ -117,6 +194,7 @@ def shadergroup_to_materials(shadergroup, filepath):
             dtl = material.node_tree.nodes["DetailSampler"]
             dtl_ext.image = dtl.image
 
+        _material_cache[shader_key] = material.name
         materials.append(material)
 
     return materials
@@ -309,38 +387,67 @@ def light_to_obj(light, armature_obj=None):
     return lobj
 
 
+def get_vertex_group_name(index, bones=None, bone_ids=None):
+    if bones and index < len(bones):
+        return bones[index].name
+    elif bone_ids:
+        return f"UNKNOWN_BONE.{str(index)}.{bone_ids[len(bone_ids) - 1]}"
+    return "UNK"
+
+
+def create_vertex_groups(obj, blend_weights, blend_indices, bones=None, bone_ids=None):
+    """Create a vertex group for every bone referenced by the blend weights and assign the weights,
+    with one add() call per weight value of each group"""
+    # Every non-zero influence as (vertex, bone, weight)
+    vertex_indices, slots = np.nonzero(blend_weights)
+    bone_indices = blend_indices[vertex_indices, slots].astype(np.int64)
+    weights = blend_weights[vertex_indices, slots].astype(np.int64)
+    if len(weights) == 0:
+        return
+
+    # Influences of a vertex on the same bone add up
+    num_bones = int(bone_indices.max()) + 1
+    keys, inverse = np.unique(
+        vertex_indices * num_bones + bone_indices, return_inverse=True)
+    weights = np.bincount(inverse.ravel(), weights=weights).astype(np.int64)
+    vertex_indices = keys // num_bones
+    bone_indices = keys % num_bones
+
+    # Sort by bone, then weight, and split into runs of equal (bone, weight)
+    order = np.lexsort((weights, bone_indices))
+    vertex_indices = vertex_indices[order]
+    bone_indices = bone_indices[order]
+    weights = weights[order]
+    run_starts = np.flatnonzero(
+        np.diff(bone_indices) | np.diff(weights)) + 1
+    run_starts = np.concatenate(([0], run_starts, [len(weights)]))
+
+    # Groups are created in bone index order, like the full 0-255 range would be
+    vertex_groups = {}
+    for bone_index in np.unique(bone_indices).tolist():
+        vertex_groups[bone_index] = obj.vertex_groups.new(
+            name=get_vertex_group_name(bone_index, bones, bone_ids))
+
+    for start, end in zip(run_starts[:-1].tolist(), run_starts[1:].tolist()):
+        vertex_groups[int(bone_indices[start])].add(
+            vertex_indices[start:end].tolist(), int(weights[start]) / 255, "REPLACE")
+
+
 def obj_from_buffer(vertex_buffer, index_buffer, material, bones=None, name=None, bone_ids=None):
-    vertices = []
-    normals = []
-    texcoords = {}
-    colors = {}
-
-    has_normals = False
-
-    for vertex in vertex_buffer:
-        vertices.append(vertex.position)
-        if hasattr(vertex, "normal"):
-            has_normals = True
-            normals.append(vertex.normal)
-
-        for key, value in vertex._asdict().items():
-            if 'texcoord' in key:
-                if not key in texcoords.keys():
-                    texcoords[key] = []
-                texcoords[key].append(value)
-            if 'colour' in key:
-                if not key in colors.keys():
-                    colors[key] = []
-                colors[key].append(value)
+    fields = vertex_buffer.dtype.names
+    texcoords = {key: vertex_buffer[key]
+                 for key in fields if 'texcoord' in key}
+    colors = {key: vertex_buffer[key] for key in fields if 'colour' in key}
 
     # create mesh
     mesh = bpy.data.meshes.new(SOLLUMZ_UI_NAMES[SollumType.DRAWABLE_GEOMETRY])
-    mesh.from_pydata(vertices, [], index_buffer)
+    create_triangle_mesh(mesh, vertex_buffer["position"], index_buffer)
 
     # set normals
-    if has_normals:
-        mesh.polygons.foreach_set("use_smooth", [True] * len(mesh.polygons))
-        mesh.normals_split_custom_set_from_vertices(normals)
+    if "normal" in fields:
+        mesh.polygons.foreach_set("use_smooth", np.ones(
+            len(mesh.polygons), dtype=bool))
+        mesh.normals_split_custom_set_from_vertices(vertex_buffer["normal"])
         mesh.use_auto_smooth = True
 
     # set uvs
@@ -359,27 +466,10 @@ def obj_from_buffer(vertex_buffer, index_buffer, material, bones=None, name=None
     obj.data.materials.append(material)
 
     # set weights
-    if hasattr(vertex_buffer[0], "blendweights"):
-        if vertex_buffer[0].blendweights is not None and len(vertex_buffer) > 0:
-            bone_count = 256 if not bones else len(bones)
-            num = max(256, bone_count)
-            for i in range(num):
-                bone_name = "UNK"
-                if bones and i < bone_count:
-                    bone_name = bones[i].name
-                elif bone_ids:
-                    bone_name = f"UNKNOWN_BONE.{str(i)}.{bone_ids[len(bone_ids) - 1]}"
-                obj.vertex_groups.new(name=bone_name)
-
-            for vertex_idx, vertex in enumerate(vertex_buffer):
-                for i in range(0, 4):
-                    weight = vertex.blendweights[i] / 255
-                    index = vertex.blendindices[i]
-                    if (weight > 0.0):
-                        obj.vertex_groups[index].add(
-                            [vertex_idx], weight, "ADD")
-
-            remove_unused_vertex_groups_of_mesh(obj)
+    if "blendweights" in fields:
+        if len(vertex_buffer) > 0:
+            create_vertex_groups(obj, vertex_buffer["blendweights"],
+                                 vertex_buffer["blendindices"], bones, bone_ids)
 
     obj.sollum_type = SollumType.DRAWABLE_GEOMETRY
     bpy.context.collection.objects.link(obj)
@@ -389,8 +479,8 @@ def obj_from_buffer(vertex_buffer, index_buffer, material, bones=None, name=None
 
 def geometry_to_obj(geometry, material, bones=None, name=None):
     vertex_buffer = geometry.vertex_buffer.get_data()
-    index_buffer = [geometry.index_buffer.data[i * 3:(i + 1) * 3]
-                    for i in range((len(geometry.index_buffer.data) + 3 - 1) // 3)]
+    index_buffer = np.array(
+        geometry.index_buffer.data, dtype=np.int32).reshape(-1, 3)
     return obj_from_buffer(vertex_buffer, index_buffer, material, bones, name)
 
 
@@ -407,14 +497,16 @@ def geometry_to_obj_split_by_bone(model, materials, bones):
         triangles = [indices[i * 3:(i + 1) * 3]
                      for i in range((len(indices) + 3 - 1) // 3)]
 
+        blend_weights = vertices["blendweights"]
+        blend_indices = vertices["blendindices"]
+
         for tri in triangles:
             key = []
             for index in tri:
-                vert = vertices[index]
-                inds = vert.blendindices
-                for idx, w in enumerate(vert.blendweights):
+                inds = blend_indices[index]
+                for idx, w in enumerate(blend_weights[index]):
                     if w != 0:
-                        ind = inds[idx]
+                        ind = int(inds[idx])
                         if ind not in key:
                             key.append(ind)
             key.sort()
@@ -431,33 +523,31 @@ def geometry_to_obj_split_by_bone(model, materials, bones):
                 i0 = tri[0]
                 i1 = tri[1]
                 i2 = tri[2]
-                v0 = vertices[i0]
-                v1 = vertices[i1]
-                v2 = vertices[i2]
                 if i0 in imap:
                     i0 = imap[i0]
                 else:
                     imap[i0] = len(vlist)
-                    i0 = len(vlist)
-                    vlist.append(v0)
+                    vlist.append(i0)
+                    i0 = imap[i0]
                 if i1 in imap:
                     i1 = imap[i1]
                 else:
                     imap[i1] = len(vlist)
-                    i1 = len(vlist)
-                    vlist.append(v1)
+                    vlist.append(i1)
+                    i1 = imap[i1]
                 if i2 in imap:
                     i2 = imap[i2]
                 else:
                     imap[i2] = len(vlist)
-                    i2 = len(vlist)
-                    vlist.append(v2)
+                    vlist.append(i2)
+                    i2 = imap[i2]
                 tri[0] = i0
                 tri[1] = i1
                 tri[2] = i2
 
         for bone in bone_ind_map:
-            verts = vertex_map[bone]
+            # vertex_map holds the source vertex indices of each split
+            verts = vertices[vertex_map[bone]]
             faces = bone_ind_map[bone]
 
             obj = obj_from_buffer(
@@ -606,8 +696,9 @@ def drawable_to_obj(drawable, filepath, name, bones_override=None, materials=Non
     return obj
 
 
-def import_ydr(filepath, import_settings):
-    ydr_xml = YDR.from_xml_file(filepath)
+def import_ydr(filepath, import_settings, ydr_xml=None):
+    if ydr_xml is None:
+        ydr_xml = YDR.from_xml_file(filepath)
     drawable = drawable_to_obj(ydr_xml, filepath, os.path.basename(
         filepath.replace(YDR.file_extension, '')), None, None, import_settings)
     if import_settings.join_geometries:
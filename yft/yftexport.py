@@ -261,11 +261,10 @@ def fragment_from_object(exportop, fobj, exportpath, export_settings=None):
     return fragment
 
 
-def export_yft(exportop, obj, filepath, export_settings):
-    fragment = fragment_from_object(exportop, obj, filepath, export_settings)
+def write_fragment(fragment, filepath, export_with_hi=False):
     fragment.write_xml(filepath)
 
-    if export_settings.export_with_hi:
+    if export_with_hi:
         fragment.drawable.drawable_models_med = None
         fragment.drawable.drawable_models_low = None
         fragment.drawable.drawable_models_vlow = None
@@ -276,3 +275,8 @@ def export_yft(exportop, obj, filepath, export_settings):
         filepath = os.path.join(os.path.dirname(filepath),
                                 os.path.basename(filepath).replace(".yft.xml", "_hi.yft.xml"))
         fragment.write_xml(filepath)
+
+
+def export_yft(exportop, obj, filepath, export_settings):
+    fragment = fragment_from_object(exportop, obj, filepath, export_settings)
+    write_fragment(fragment, filepath, export_settings.export_with_hi)
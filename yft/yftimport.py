@@ -239,6 +239,7 @@ def get_fragment_drawable(fragment):
             return child
 
 
-def import_yft(filepath, import_settings):
-    yft_xml = YFT.from_xml_file(filepath)
+def import_yft(filepath, import_settings, yft_xml=None):
+    if yft_xml is None:
+        yft_xml = YFT.from_xml_file(filepath)
     fragment_to_obj(yft_xml, filepath, import_settings)
@@ -159,6 +159,7 @@ def navmesh_to_obj(navmesh, filepath):
     bpy.context.collection.objects.link(npobj)
 
 
-def import_ynv(filepath):
-    ynv_xml = YNV.from_xml_file(filepath)
+def import_ynv(filepath, ynv_xml=None):
+    if ynv_xml is None:
+        ynv_xml = YNV.from_xml_file(filepath)
     navmesh_to_obj(ynv_xml, filepath)
@@ -2,7 +2,7 @@ import bpy
 from ..sollumz_helper import SOLLUMZ_OT_base, has_embedded_textures, has_collision
 from ..sollumz_properties import SOLLUMZ_UI_NAMES, ArchetypeType, AssetType, SollumType, EntityPriorityLevel, EntityLodLevel
 from ..sollumz_operators import SelectTimeFlagsRange, ClearTimeFlags
-from ..tools.blenderhelper import get_selected_vertices
+from ..tools.blenderhelper import get_selected_vertices, build_name_object_map
 from ..tools.meshhelper import get_bound_extents, get_bound_center, get_obj_radius
 from ..tools.utils import get_min_vector_list, get_max_vector_list, sort_points, is_coplanar
 from ..resources.ytyp import *
@@ -551,6 +551,10 @@ class SOLLUMZ_OT_import_ytyp(SOLLUMZ_OT_base, bpy.types.Operator, ImportHelper):
             ytyp_xml = YTYP.from_xml_file(self.filepath)
             ytyp = context.scene.ytyps.add()
             ytyp.name = ytyp_xml.name
+            scene_objects = build_name_object_map(
+                context.scene.collection.all_objects)
+            view_layer_objects = build_name_object_map(
+                context.collection.all_objects, context.view_layer)
             for arch_xml in ytyp_xml.archetypes:
                 arch = ytyp.archetypes.add()
                 arch.name = arch_xml.name
@@ -567,9 +571,8 @@ class SOLLUMZ_OT_import_ytyp(SOLLUMZ_OT_base, bpy.types.Operator, ImportHelper):
                 arch.bs_radius = arch_xml.bs_radius
                 arch.asset_name = arch_xml.asset_name
                 # Find asset in scene
-                for obj in context.scene.collection.all_objects:
-                    if obj.name == arch.asset_name:
-                        arch.asset = obj
+                for obj in scene_objects.get(arch.asset_name, ()):
+                    arch.asset = obj
 
                 if arch_xml.type == "CBaseArchetypeDef":
                     arch.type = ArchetypeType.BASE
@@ -585,9 +588,8 @@ class SOLLUMZ_OT_import_ytyp(SOLLUMZ_OT_base, bpy.types.Operator, ImportHelper):
                         entity.rotation = entity_xml.rotation
                         entity.scale_xy = entity_xml.scale_xy
                         entity.scale_z = entity_xml.scale_z
-                        for obj in context.collection.all_objects:
-                            if entity_xml.archetype_name == obj.name and obj.name in context.view_layer.objects:
-                                entity.linked_object = obj
+                        for obj in view_layer_objects.get(entity_xml.archetype_name, ()):
+                            entity.linked_object = obj
                         entity.archetype_name = entity_xml.archetype_name
                         entity.flags.total = str(entity_xml.flags)
                         entity.guid = entity_xml.guid